@@ -16,6 +16,7 @@ from rest_framework.response import Response
 from django.core.validators import validate_email
 # from .helpers import generate_otp, send_email
 from .helpers import send_email, generate_unique_phone, get_tokens_for_user, upload_to_imagekit
+from docket.logos import cache_logo
 from .serializers import RegisterSerializer, PasswordResetConfirmSerializer, UserProfileSerializer
 from django.utils import timezone
 from rest_framework.throttling import UserRateThrottle
@@ -449,6 +450,8 @@ class ProfileUpdateView(APIView):
             # Image update
             if image_file:
                 user.image = upload_to_imagekit(image_file)
+                # Keep a local copy for PDFs while the upload is at hand
+                cache_logo(user.image, image_file)
             elif request.data.get('image') == '':
                 user.image = None
 
@@ -492,6 +495,8 @@ class ProfileImageUpdateView(APIView):
             # Image update
             if image_file:
                 user.image = upload_to_imagekit(image_file)
+                # Keep a local copy for PDFs while the upload is at hand
+                cache_logo(user.image, image_file)
             elif request.data.get('image') == '':
                 user.image = None
             
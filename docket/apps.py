@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class DocketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'docket'
+
+    def ready(self):
+        if settings.PDF_WARMUP:
+            from .pdf import warm_up
+            warm_up()
@@ -0,0 +1,83 @@
+import logging
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import PDFJob, StatementBatch
+from .pdf import PAYOFF_STATEMENT, document_date, pdf_renderer
+from .pdf_cache import render_cached
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_pdf_job(user, case, kind, end_date=None, renderer=''):
+    return PDFJob.objects.create(user=user, case=case, kind=kind, end_date=end_date, renderer=renderer)
+
+
+def enqueue_statement_batch(user, case_ids, end_date, format, renderer=''):
+    """
+    Queues a payoff statement job for each case in ``case_ids``, all in one
+    StatementBatch. The PDF workers render them side by side like any other
+    job, and the batch is downloaded once none is left to run.
+    """
+    with transaction.atomic():
+        batch = StatementBatch.objects.create(user=user, end_date=end_date, format=format)
+        PDFJob.objects.bulk_create([
+            PDFJob(user=user, case_id=case_id, kind=PAYOFF_STATEMENT, end_date=end_date, renderer=renderer, batch=batch)
+            for case_id in case_ids
+        ], batch_size=1000)
+    return batch
+
+
+def with_progress(batches):
+    """Annotates StatementBatch rows with the number of their jobs in total, done and failed."""
+    return batches.annotate(
+        total=Count('jobs'),
+        done=Count('jobs', filter=Q(jobs__status=PDFJob.DONE)),
+        failed=Count('jobs', filter=Q(jobs__status=PDFJob.FAILED)),
+    )
+
+
+def claim_pdf_job():
+    """
+    Marks the oldest pending job as running and returns its id, or None when
+    the queue is empty. Rows locked by another worker are skipped, so several
+    workers can share the queue.
+    """
+    with transaction.atomic():
+        job = (
+            PDFJob.objects.select_for_update(skip_locked=True)
+            .filter(status=PDFJob.PENDING)
+            .order_by('created_at')
+            .only('id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        PDFJob.objects.filter(id=job.id).update(status=PDFJob.RUNNING, started_at=timezone.now())
+        return job.id
+
+
+def run_pdf_job(job_id):
+    """Renders a claimed job and stores the PDF or the error on it. Runs in the worker's process pool."""
+    job = PDFJob.objects.select_related('case', 'user').defer('pdf').get(id=job_id)
+    try:
+        pdf = render_cached(
+            job.kind, job.case, job.user, job.end_date, document_date(job.kind), pdf_renderer(job.renderer)
+        )
+    except Exception as e:
+        logger.error("PDF job %s failed.", job_id, exc_info=True)
+        fail_pdf_job(job_id, str(e))
+        return PDFJob.FAILED
+
+    PDFJob.objects.filter(id=job_id).update(status=PDFJob.DONE, pdf=pdf, finished_at=timezone.now())
+    return PDFJob.DONE
+
+
+def fail_pdf_job(job_id, error):
+    PDFJob.objects.filter(id=job_id).update(status=PDFJob.FAILED, error=error, finished_at=timezone.now())
+
+
+def requeue_pdf_job(job_id):
+    PDFJob.objects.filter(id=job_id).update(status=PDFJob.PENDING, started_at=None)
@@ -0,0 +1,208 @@
+from datetime import date
+from decimal import ROUND_DOWN, ROUND_HALF_EVEN, ROUND_HALF_UP, Context, Decimal, localcontext
+from functools import wraps
+from typing import NamedTuple
+
+
+ZERO = Decimal('0.00')
+
+# Balances are at most 20 digits and rates 10, so principal * rate * days
+# needs 36 digits to stay exact, and the division by 36500 must be precise
+# enough never to move a value across a rounding threshold at the 5th
+# decimal place. 40 significant digits covers both.
+LEDGER_CONTEXT = Context(prec=40, rounding=ROUND_HALF_EVEN)
+
+# Annual rates are stored as percentages, so a day's interest is
+# principal * rate / 100 / 365.
+DAILY_RATE_DIVISOR = Decimal('36500')
+
+# Integer scales matching the DecimalField precision of balances and rates
+BALANCE_SCALE = 10 ** 10
+RATE_SCALE = 10 ** 6
+CENT = BALANCE_SCALE // 100
+
+# principal * rate * days / _CENT_DIVISOR is the interest in cents when
+# principal and rate are scaled integers
+_CENT_DIVISOR = 36500 * BALANCE_SCALE * RATE_SCALE // 100
+
+
+def ledger_math(func):
+    """Runs ``func`` under LEDGER_CONTEXT without touching the thread's own context."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with localcontext(LEDGER_CONTEXT):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class LedgerError(ValueError):
+    """Raised when a transaction cannot be applied to the running balances."""
+
+
+class LedgerState(NamedTuple):
+    """Running balances of a case immediately after a transaction."""
+    date: date
+    principal: Decimal
+    accrued_interest: Decimal
+
+    @property
+    def payoff(self):
+        return self.principal + self.accrued_interest
+
+    @classmethod
+    def opening(cls, judgment_amount, judgment_date):
+        # Before any transaction the whole judgment is principal and no interest has accrued
+        return cls(judgment_date, judgment_amount, ZERO)
+
+    @classmethod
+    def from_transaction(cls, tx):
+        return cls(tx.date, tx.show_principal_balance, tx.accrued_interest)
+
+
+_CENT = Decimal('0.01')
+_HALF_CENT = Decimal('0.005')
+# Remainders from here up round to a whole cent at four decimal places
+_CARRY_CENT = Decimal('0.00995')
+
+
+# Custom function to implement the unique rounding logic from the web app
+def apply_custom_rounding(value):
+    """
+    Applies the custom rounding logic: rounds to 2 decimal places if the
+    3rd and 4th decimal digits are >= 50, otherwise truncates.
+
+    The digits are read after rounding to 4 decimal places, so the value is
+    rounded up exactly when the remainder below the cent is at least 0.005 and
+    less than 0.00995 (from 0.00995 the 4-place rounding carries into the cent
+    and leaves 00). That decision only needs one truncation and a comparison.
+    """
+    truncated = value.quantize(_CENT, rounding=ROUND_DOWN)
+    if _HALF_CENT <= abs(value - truncated) < _CARRY_CENT:
+        return value.quantize(_CENT, rounding=ROUND_HALF_UP)
+    return truncated
+
+
+@ledger_math
+def daily_interest(principal, interest_rate):
+    return principal * interest_rate / DAILY_RATE_DIVISOR
+
+
+def _accrue_interest(principal, interest_rate, days):
+    if days <= 0:
+        return ZERO
+    # Multiply before dividing so the only inexact step is the final division
+    return apply_custom_rounding(principal * interest_rate * days / DAILY_RATE_DIVISOR)
+
+
+@ledger_math
+def accrue_interest(principal, interest_rate, days):
+    """Simple interest on ``principal`` for ``days`` days, custom-rounded."""
+    return _accrue_interest(principal, interest_rate, days)
+
+
+@ledger_math
+def apply_transaction(state, interest_rate, transaction_type, amount, tx_date):
+    """
+    Returns the LedgerState after applying one transaction to ``state``.
+
+    Interest accrues on the principal since the previous transaction, payments
+    settle accrued interest first and then principal, costs add to principal
+    and manual interest entries add to accrued interest.
+    """
+    return _apply_transaction(state, interest_rate, transaction_type, amount, tx_date)
+
+
+def _apply_transaction(state, interest_rate, transaction_type, amount, tx_date):
+    principal = state.principal
+    accrued_interest = state.accrued_interest
+
+    # 1. Accrue interest since the previous transaction
+    if tx_date > state.date:
+        accrued_interest += _accrue_interest(principal, interest_rate, (tx_date - state.date).days)
+
+    # 2. Process the transaction based on its type
+    if transaction_type == 'PAYMENT':
+        if amount >= accrued_interest:
+            remaining_payment = apply_custom_rounding(amount - accrued_interest)
+            accrued_interest = ZERO
+
+            if remaining_payment > principal:
+                raise LedgerError('Payment amount exceeds the outstanding principal balance.')
+
+            principal -= remaining_payment
+        else:
+            # Payment only covers a portion of the interest
+            accrued_interest -= amount
+
+    elif transaction_type == 'COST':
+        principal += amount
+
+    elif transaction_type == 'INTEREST':
+        accrued_interest += amount
+
+    # 3. Principal is always carried at the custom-rounded value
+    return LedgerState(tx_date, apply_custom_rounding(principal), accrued_interest)
+
+
+@ledger_math
+def replay(state, interest_rate, transactions):
+    """
+    Applies ``transactions`` (ordered by date, each exposing ``transaction_type``,
+    ``amount`` and ``date``) on top of ``state`` and returns the LedgerState
+    after each one, in the same order.
+    """
+    states = []
+    for tx in transactions:
+        state = _apply_transaction(state, interest_rate, tx.transaction_type, tx.amount, tx.date)
+        states.append(state)
+    return states
+
+
+@ledger_math
+def payoff_as_of(state, interest_rate, as_of):
+    """Payoff on ``as_of``: the balances in ``state`` plus interest accrued since."""
+    return state.payoff + _accrue_interest(state.principal, interest_rate, (as_of - state.date).days)
+
+
+def accrue_interest_scaled(principal, interest_rate, days):
+    """
+    Integer counterpart of accrue_interest: ``principal`` is in units of
+    1/BALANCE_SCALE, ``interest_rate`` in units of 1/RATE_SCALE percent and the
+    result is in units of 1/BALANCE_SCALE.
+
+    apply_custom_rounding rounds a value up to the next cent only when the
+    fraction of a cent left over is at least 0.5 and, once rounded to four
+    decimal places, does not carry into the cent digit (below 0.995); otherwise
+    it truncates. The same decision is made here exactly on the integer
+    quotient and remainder.
+    """
+    if days <= 0:
+        return 0
+    numerator = principal * interest_rate * days
+    cents, remainder = divmod(abs(numerator), _CENT_DIVISOR)
+    if 2 * remainder >= _CENT_DIVISOR and 200 * remainder < 199 * _CENT_DIVISOR:
+        cents += 1
+    return cents * CENT if numerator >= 0 else -cents * CENT
+
+
+@ledger_math
+def batch_payoffs_as_of(states, as_of):
+    """
+    Payoffs on ``as_of`` for many ledgers at once.
+
+    ``states`` yields ``(principal, accrued_interest, interest_rate, date)``
+    tuples of Decimals as loaded from the database; the result is the list of
+    payoffs in the same order, equal to payoff_as_of() for each one. All the
+    arithmetic is done on scaled integers, which avoids building Decimal
+    intermediates for every case.
+    """
+    payoffs = []
+    for principal, accrued_interest, interest_rate, since in states:
+        scaled_principal = int(principal * BALANCE_SCALE)
+        scaled_payoff = (
+            scaled_principal
+            + int(accrued_interest * BALANCE_SCALE)
+            + accrue_interest_scaled(scaled_principal, int(interest_rate * RATE_SCALE), (as_of - since).days)
+        )
+        payoffs.append(Decimal(scaled_payoff).scaleb(-10))
+    return payoffs
@@ -0,0 +1,22 @@
+from decimal import ROUND_DOWN, ROUND_HALF_UP, Decimal
+
+
+# Reference implementations that the ledger engine's optimized versions are
+# checked against, by the tests and by `manage.py benchmark_ledger`.
+
+
+def legacy_custom_rounding(value):
+    """The original apply_custom_rounding, reading the 3rd and 4th decimals of the value rounded to 4 places."""
+    truncated_to_4 = value.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
+    third_fourth_digits = abs(int(truncated_to_4 * 10000)) % 100
+    if third_fourth_digits >= 50:
+        return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return (value * 100).to_integral_value(rounding=ROUND_DOWN) / 100
+
+
+# Fractions of a cent on either side of the thresholds where the custom rounding flips
+ROUNDING_EDGES = [
+    Decimal(edge) for edge in (
+        '0', '0.0049499', '0.0049999', '0.00495', '0.005', '0.0050001', '0.0099499', '0.009949999', '0.00995', '0.0099999',
+    )
+]
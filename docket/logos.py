@@ -0,0 +1,76 @@
+import hashlib
+import logging
+import os
+from io import BytesIO
+from urllib.request import urlopen
+from django.conf import settings
+from PIL import Image
+
+
+# Local copies of the logos printed on PDFs. Renders only ever read from here;
+# the copies are made when a profile image is uploaded, or by `manage.py
+# cache_logos` for images uploaded earlier.
+
+logger = logging.getLogger(__name__)
+
+JUDGMENTCALC_LOGO_URL = 'https://ik.imagekit.io/mazhar/Judgement-Calc/Logo-CIYWy4e5.png?updatedAt=1754417550538'
+
+FETCH_TIMEOUT_SECONDS = 10
+
+
+def logo_path(url):
+    return os.path.join(settings.LOGO_CACHE_DIR, hashlib.sha256(url.encode()).hexdigest() + '.jpg')
+
+
+def cached_logo(url):
+    """Path of the local copy of the logo at ``url``, or None when there is none. Never touches the network."""
+    if not url:
+        return None
+    path = logo_path(url)
+    return path if os.path.exists(path) else None
+
+
+def cache_logo(url, image_file=None):
+    """
+    Stores a downsampled copy of the logo at ``url``, read from ``image_file``
+    when the upload is at hand and downloaded otherwise. Returns the path, or
+    None when the image can't be read; a profile update never fails over it.
+    """
+    try:
+        if image_file is None:
+            with urlopen(url, timeout=FETCH_TIMEOUT_SECONDS) as response:
+                data = response.read()
+        else:
+            image_file.seek(0)
+            data = image_file.read()
+
+        image = Image.open(BytesIO(data))
+        image.thumbnail((settings.LOGO_MAX_PIXELS, settings.LOGO_MAX_PIXELS))
+
+        # Saved as a JPEG flattened onto the white page: PDFs embed JPEG data
+        # as it is, so rendering never decodes the image again
+        image = image.convert('RGBA')
+        flattened = Image.new('RGB', image.size, 'white')
+        flattened.paste(image, mask=image.getchannel('A'))
+
+        os.makedirs(settings.LOGO_CACHE_DIR, exist_ok=True)
+        path = logo_path(url)
+        # Written aside and renamed so a render never reads half a file
+        partial = f'{path}.{os.getpid()}.part'
+        flattened.save(partial, 'JPEG', quality=90)
+        os.replace(partial, path)
+    except Exception:
+        logger.warning("Could not cache logo %s.", url, exc_info=True)
+        return None
+
+    return path
+
+
+def logo_link_callback(uri, rel):
+    """
+    xhtml2pdf link_callback: remote images are read from the logo cache. A
+    logo that isn't cached is left out of the document rather than fetched.
+    """
+    if uri.startswith(('http://', 'https://')):
+        return logo_path(uri)
+    return uri
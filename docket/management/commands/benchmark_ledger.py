@@ -0,0 +1,259 @@
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from docket.ledger import LedgerState, apply_custom_rounding, batch_payoffs_as_of, payoff_as_of
+from docket.ledger_reference import ROUNDING_EDGES, legacy_custom_rounding
+from docket.models import CaseDetails, Transaction
+from docket.pdf import CASE_TRANSACTIONS, REPORTLAB, RENDERERS, case_transactions_context, render_context
+from docket.pdf_stream import stream_case_transactions
+from docket.renderers import ORJSONRenderer
+from docket.serializers import TransactionDetailSerializer, transaction_list_data
+
+
+def count_pages(pdf):
+    return len(re.findall(rb'/Type\s*/Page\b', pdf))
+
+
+# Run by the pdf-warmup scenario in a new interpreter, so nothing is imported
+# or compiled before it is timed. The first request imports docket.pdf, as
+# the first request to a server does through the URLconf.
+COLD_START = """
+import json, time
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - started
+
+timings = []
+for _ in range({renders}):
+    started = time.perf_counter()
+    from datetime import date
+    from docket.pdf import render_context, sample_contexts
+    for kind, context in sample_contexts(date.today()).items():
+        render_context(kind, context, {renderer!r})
+    timings.append(time.perf_counter() - started)
+print(json.dumps({{'setup': setup, 'timings': timings}}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Benchmark ledger hot paths on synthetic data. Touches no database tables."
+
+    scenarios = ['batch-accrual', 'rounding', 'list-serialization', 'pdf-render', 'pdf-stream', 'pdf-warmup']
+
+    # Ledger sizes rendered by the pdf-render scenario
+    pdf_ledger_sizes = [10, 1000, 10000]
+
+    # Ledger sizes streamed by the pdf-stream scenario, and the largest also rendered whole for comparison
+    stream_ledger_sizes = [1000, 10000, 100000]
+    stream_compare_max = 10000
+
+    # Requests timed in each fresh process by the pdf-warmup scenario
+    warmup_renders = 20
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=self.scenarios)
+        parser.add_argument('--rows', type=int, default=100000, help="Synthetic rows per run.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--renderer', action='append', choices=RENDERERS,
+            help="PDF renderer for pdf-render and pdf-warmup; repeat for several. Defaults to all."
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.renderers = options['renderer'] or RENDERERS
+        getattr(self, 'bench_' + options['scenario'].replace('-', '_'))(options['rows'])
+
+    def report(self, label, rows, seconds):
+        self.stdout.write(f"{label:<32} {rows:>10} rows  {seconds:8.3f}s  {rows / seconds:>12,.0f} rows/s")
+
+    def synthetic_states(self, rows, as_of):
+        states = []
+        for _ in range(rows):
+            states.append((
+                Decimal(self.random.randint(0, 10 ** 15)).scaleb(-10),
+                Decimal(self.random.randint(0, 10 ** 12)).scaleb(-10),
+                Decimal(self.random.randint(0, 25 * 10 ** 6)).scaleb(-6),
+                as_of - timedelta(days=self.random.randint(0, 7300)),
+            ))
+        return states
+
+    def bench_batch_accrual(self, rows):
+        as_of = date.today()
+        states = self.synthetic_states(rows, as_of)
+
+        started = time.perf_counter()
+        expected = [
+            payoff_as_of(LedgerState(since, principal, accrued_interest), interest_rate, as_of)
+            for principal, accrued_interest, interest_rate, since in states
+        ]
+        self.report("per-case Decimal payoff_as_of", rows, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        payoffs = batch_payoffs_as_of(states, as_of)
+        self.report("batch_payoffs_as_of", rows, time.perf_counter() - started)
+
+        mismatches = sum(1 for a, b in zip(expected, payoffs) if a != b)
+        self.stdout.write(f"mismatches: {mismatches}")
+
+    def synthetic_amounts(self, rows):
+        # Mix of arbitrary values and values sitting on the rounding thresholds
+        amounts = []
+        for _ in range(rows):
+            if self.random.random() < 0.5:
+                amount = Decimal(self.random.randint(-10 ** 18, 10 ** 18)).scaleb(-self.random.randint(0, 12))
+            else:
+                amount = Decimal(self.random.randint(-10 ** 10, 10 ** 10)).scaleb(-2) + self.random.choice(ROUNDING_EDGES)
+            amounts.append(amount)
+        return amounts
+
+    def bench_rounding(self, rows):
+        amounts = self.synthetic_amounts(rows)
+
+        started = time.perf_counter()
+        expected = [legacy_custom_rounding(amount) for amount in amounts]
+        self.report("legacy apply_custom_rounding", rows, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        rounded = [apply_custom_rounding(amount) for amount in amounts]
+        self.report("apply_custom_rounding", rows, time.perf_counter() - started)
+
+        mismatches = sum(1 for a, b in zip(expected, rounded) if a != b)
+        self.stdout.write(f"mismatches: {mismatches}")
+
+    def synthetic_transactions(self, rows):
+        transactions = []
+        tx_date = date(2000, 1, 1)
+        for tx_id in range(1, rows + 1):
+            tx_date += timedelta(days=1)
+            transactions.append(Transaction(
+                id=tx_id,
+                transaction_type=self.random.choice(['PAYMENT', 'COST']),
+                amount=Decimal(self.random.randint(1, 10 ** 14)).scaleb(-10),
+                date=tx_date,
+                description=self.random.choice(['', 'Court fee', None]),
+                accrued_interest=Decimal(self.random.randint(0, 10 ** 14)).scaleb(-10),
+                principal_balance=Decimal(self.random.randint(0, 10 ** 16)).scaleb(-10),
+                show_principal_balance=Decimal(self.random.randint(0, 10 ** 16)).scaleb(-10),
+            ))
+        return transactions
+
+    def bench_list_serialization(self, rows):
+        transactions = self.synthetic_transactions(rows)
+        interest_rate = Decimal('9.000000')
+
+        started = time.perf_counter()
+        expected = JSONRenderer().render(
+            TransactionDetailSerializer(transactions, many=True, context={'interest_rate': interest_rate}).data
+        )
+        self.report("DRF serializer + JSONRenderer", rows, time.perf_counter() - started)
+
+        # The list view reads the same columns with values_list()
+        value_rows = [
+            (tx.id, tx.transaction_type, tx.amount, tx.date, tx.description, tx.accrued_interest, tx.show_principal_balance)
+            for tx in transactions
+        ]
+        started = time.perf_counter()
+        rendered = ORJSONRenderer().render(transaction_list_data(value_rows, interest_rate))
+        self.report("transaction_list_data + orjson", rows, time.perf_counter() - started)
+
+        self.stdout.write(f"identical output: {rendered == expected}")
+
+    def benchmark_case(self):
+        return CaseDetails(
+            id=1, case_name='Benchmark v. Ledger', court_name='Benchmark Court', court_case_number='BENCH-1',
+            judgment_amount=Decimal('250000.00'), judgment_date=date(2000, 1, 1), interest_rate=Decimal('9.000000'),
+        )
+
+    def bench_pdf_render(self, rows):
+        # Ledger reports of each size in pdf_ledger_sizes; --rows is not used
+        case = self.benchmark_case()
+        for size in self.pdf_ledger_sizes:
+            context = case_transactions_context(case, self.synthetic_transactions(size), date.today())
+            for renderer in self.renderers:
+                started = time.perf_counter()
+                pdf = render_context(CASE_TRANSACTIONS, context, renderer)
+                seconds = time.perf_counter() - started
+                pages = count_pages(pdf)
+                self.stdout.write(
+                    f"{renderer:<10} {size:>6} rows  {pages:>5} pages  {seconds:8.3f}s  {pages / seconds:>8,.1f} pages/s"
+                )
+
+    def ledger_row_stream(self, rows):
+        # ledger_rows() tuples made one at a time, like a database iterator
+        tx_date = date(2000, 1, 1)
+        for _ in range(rows):
+            tx_date += timedelta(days=1)
+            yield (
+                tx_date,
+                self.random.choice(['PAYMENT', 'COST']),
+                Decimal(self.random.randint(1, 10 ** 14)).scaleb(-10),
+                Decimal(self.random.randint(0, 10 ** 14)).scaleb(-10),
+                Decimal(self.random.randint(0, 10 ** 16)).scaleb(-10),
+            )
+
+    def measure(self, label, size, render):
+        """Runs ``render``, which returns the PDF size and page count, and reports its time and peak memory."""
+        tracemalloc.start()
+        started = time.perf_counter()
+        length, pages = render()
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{label:<10} {size:>7} rows  {pages:>5} pages  {length / 2 ** 20:7.2f} MiB  {seconds:8.3f}s  "
+            f"peak {peak / 2 ** 20:8.2f} MiB"
+        )
+
+    def bench_pdf_stream(self, rows):
+        # Streamed transaction summaries of each size in stream_ledger_sizes,
+        # against the whole-document ReportLab render; --rows is not used
+        case = self.benchmark_case()
+        today = date.today()
+
+        def streamed(size):
+            length = pages = 0
+            for chunk in stream_case_transactions(case, self.ledger_row_stream(size), today):
+                # Only the running totals are kept, as a response sent to a client
+                length += len(chunk)
+                pages += count_pages(chunk)
+            return length, pages
+
+        def whole(size):
+            context = case_transactions_context(case, self.synthetic_transactions(size), today)
+            pdf = render_context(CASE_TRANSACTIONS, context, REPORTLAB)
+            return len(pdf), count_pages(pdf)
+
+        for size in self.stream_ledger_sizes:
+            self.measure('stream', size, lambda: streamed(size))
+            if size <= self.stream_compare_max:
+                self.measure(REPORTLAB, size, lambda: whole(size))
+
+    def bench_pdf_warmup(self, rows):
+        # Process start, first-request and steady-state latency of a new
+        # process, with and without PDF_WARMUP; --rows is not used
+        for renderer in self.renderers:
+            for warmup in ('False', 'True'):
+                result = subprocess.run(
+                    [sys.executable, '-c', COLD_START.format(renders=self.warmup_renders, renderer=renderer)],
+                    cwd=settings.BASE_DIR, env={**os.environ, 'PDF_WARMUP': warmup},
+                    capture_output=True, text=True, check=True,
+                )
+                timings = json.loads(result.stdout.splitlines()[-1])
+                steady = statistics.median(timings['timings'][1:])
+                self.stdout.write(
+                    f"{renderer:<10} warm-up {warmup:<5}  setup {timings['setup'] * 1000:8.1f}ms  "
+                    f"first request {timings['timings'][0] * 1000:8.1f}ms  steady {steady * 1000:8.1f}ms"
+                )
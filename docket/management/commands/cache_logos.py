@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from authentication.models import User
+from docket.logos import JUDGMENTCALC_LOGO_URL, cache_logo, cached_logo
+
+
+class Command(BaseCommand):
+    help = "Download the logos printed on PDFs into the local logo cache, for images uploaded before it existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true', help="Download logos that are already cached again.")
+
+    def handle(self, *args, **options):
+        urls = set(User.objects.exclude(image__isnull=True).exclude(image='').values_list('image', flat=True))
+        urls.add(JUDGMENTCALC_LOGO_URL)
+
+        cached = skipped = failed = 0
+        for url in sorted(urls):
+            if not options['refresh'] and cached_logo(url):
+                skipped += 1
+            elif cache_logo(url):
+                cached += 1
+            else:
+                failed += 1
+                self.stderr.write(f"Could not cache {url}")
+
+        self.stdout.write(self.style.SUCCESS(f"Cached {cached} logos, {skipped} already cached, {failed} failed."))
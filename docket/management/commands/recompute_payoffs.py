@@ -0,0 +1,58 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from docket.ledger import ZERO, batch_payoffs_as_of
+from docket.models import CaseDetails
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored today_payoff of every active case as of a date in one batched pass."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help="Payoff date (YYYY-MM-DD), defaults to today.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Cases loaded and written per batch.")
+
+    def handle(self, *args, **options):
+        if options['as_of']:
+            try:
+                as_of = datetime.strptime(options['as_of'], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        else:
+            as_of = timezone.now().date()
+
+        batch_size = options['batch_size']
+        rows = CaseDetails.objects.filter(is_active=True).values_list(
+            'id', 'judgment_amount', 'judgment_date', 'payoff_amount',
+            'accrued_interest', 'interest_rate', 'last_transaction_date'
+        ).iterator(chunk_size=batch_size)
+
+        updated = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                updated += self._recompute(batch, as_of)
+                batch = []
+        if batch:
+            updated += self._recompute(batch, as_of)
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed payoff of {updated} cases as of {as_of}."))
+
+    def _recompute(self, batch, as_of):
+        states = []
+        for _, judgment_amount, judgment_date, payoff_amount, accrued_interest, interest_rate, last_transaction_date in batch:
+            # Same starting balances as CaseDetails.ledger_state()
+            if last_transaction_date is None:
+                states.append((judgment_amount, ZERO, interest_rate, judgment_date))
+            else:
+                states.append((payoff_amount - accrued_interest, accrued_interest, interest_rate, last_transaction_date))
+
+        cases = [
+            CaseDetails(id=row[0], today_payoff=payoff)
+            for row, payoff in zip(batch, batch_payoffs_as_of(states, as_of))
+        ]
+        with transaction.atomic():
+            CaseDetails.objects.bulk_update(cases, ['today_payoff'])
+        return len(cases)
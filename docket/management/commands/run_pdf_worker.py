@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from docket.jobs import claim_pdf_job, fail_pdf_job, requeue_pdf_job, run_pdf_job
+from docket.models import PDFJob
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF jobs with a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="Size of the render pool.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument(
+            '--requeue-running', action='store_true',
+            help="Put jobs left running by a stopped worker back in the queue first. Only safe with a single worker."
+        )
+
+    def create_pool(self, processes):
+        # Pool processes are spawned rather than forked so they don't share this
+        # process's database connections; each one sets Django up on its own
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=django.setup)
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        poll_interval = options['poll_interval']
+
+        if options['requeue_running']:
+            requeued = PDFJob.objects.filter(status=PDFJob.RUNNING).update(status=PDFJob.PENDING, started_at=None)
+            self.stdout.write(f"Requeued {requeued} jobs.")
+
+        pool = self.create_pool(processes)
+        running = {}
+        # Jobs already requeued once after a pool process crashed
+        requeued = set()
+        try:
+            while True:
+                close_old_connections()
+                lost = []
+
+                # 1. Keep every pool process busy while there are pending jobs
+                while len(running) < processes:
+                    job_id = claim_pdf_job()
+                    if job_id is None:
+                        break
+                    try:
+                        running[pool.submit(run_pdf_job, job_id)] = job_id
+                    except BrokenProcessPool:
+                        lost.append(job_id)
+                        break
+
+                if not lost:
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    # 2. Report finished jobs, then look for more work
+                    done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = running.pop(future)
+                        try:
+                            self.stdout.write(f"Job {job_id}: {future.result()}")
+                        except BrokenProcessPool:
+                            lost.append(job_id)
+                        except Exception as e:
+                            # The job raised outside run_pdf_job's own error handling
+                            fail_pdf_job(job_id, str(e))
+                            self.stderr.write(f"Job {job_id}: {e}")
+
+                # 3. A crashed pool process breaks the whole pool and every job still in it
+                if lost:
+                    self.stderr.write("A render process crashed, restarting the pool.")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    for job_id in [*lost, *running.values()]:
+                        self.recover(job_id, requeued)
+                    running.clear()
+                    pool = self.create_pool(processes)
+        finally:
+            pool.shutdown()
+
+    def recover(self, job_id, requeued):
+        """
+        Puts a job lost with a crashed pool back in the queue once. There's no
+        telling which job crashed it, so one lost a second time is failed rather
+        than allowed to take down every new pool.
+        """
+        if job_id in requeued:
+            fail_pdf_job(job_id, "The render process crashed.")
+            self.stderr.write(f"Job {job_id}: the render process crashed.")
+        else:
+            requeued.add(job_id)
+            requeue_pdf_job(job_id)
+            self.stderr.write(f"Job {job_id}: requeued after the render process crashed.")
+
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docket', '0021_alter_casedetails_accrued_interest_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Date of the last transaction covered by this checkpoint')),
+                ('principal_balance', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('accrued_interest', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('total_payments', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='docket.casedetails')),
+            ],
+            options={
+                'db_table': 'ledger_checkpoints',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['case', 'date'], name='ledger_checkpoint_case_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:48
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_transaction_date(apps, schema_editor):
+    CaseDetails = apps.get_model('docket', 'CaseDetails')
+    Transaction = apps.get_model('docket', 'Transaction')
+
+    latest = Transaction.objects.filter(case=OuterRef('pk'), is_active=True).order_by('-date').values('date')[:1]
+    CaseDetails.objects.update(last_transaction_date=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docket', '0022_ledgercheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casedetails',
+            name='last_transaction_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_transaction_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docket', '0023_casedetails_last_transaction_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casedetails',
+            name='ledger_version',
+            field=models.PositiveIntegerField(default=0, help_text="Bumped whenever the case's transactions change"),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_one_transaction_per_day(apps, schema_editor):
+    """
+    Stops before the constraint is added when a case has several active
+    transactions on one day. Which one is right, and how the balances after it
+    should be replayed, is for a person to decide; nothing is changed here.
+    """
+    Transaction = apps.get_model('docket', 'Transaction')
+
+    duplicates = list(
+        Transaction.objects.filter(is_active=True)
+        .values('case_id', 'date')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by('case_id', 'date')[:20]
+    )
+    if duplicates:
+        listed = ', '.join(f"case {row['case_id']} on {row['date']} ({row['count']} transactions)" for row in duplicates)
+        raise RuntimeError(
+            'Cannot add the one-transaction-per-day constraint: some cases have more than one active transaction '
+            f'on the same day: {listed}. Deactivate or merge the extra transactions, then run migrate again.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docket', '0024_casedetails_ledger_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='casedetails',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', '-created_at'], name='case_user_active_created'),
+        ),
+        migrations.RunPython(check_one_transaction_per_day, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('case', 'date'), name='transaction_one_per_day'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docket', '0025_ledger_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='casedetails',
+            name='case_user_active_created',
+        ),
+        migrations.AddIndex(
+            model_name='casedetails',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', '-created_at', '-id'], name='case_user_active_created'),
+        ),
+    ]
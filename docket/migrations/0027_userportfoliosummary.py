@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docket', '0026_case_list_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPortfolioSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_judgments', models.DecimalField(decimal_places=10, default=Decimal('0.00'), max_digits=24)),
+                ('total_collected', models.DecimalField(decimal_places=10, default=Decimal('0.00'), max_digits=24)),
+                ('outstanding_payoff', models.DecimalField(decimal_places=10, default=Decimal('0.00'), help_text="Sum of the cases' payoff after their latest transaction", max_digits=24)),
+                ('active_cases', models.PositiveIntegerField(default=0)),
+                ('ended_cases', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_portfolio_summaries',
+            },
+        ),
+    ]
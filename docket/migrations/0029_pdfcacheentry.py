@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docket', '0028_pdfjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(help_text='File name in the PDF cache storage', max_length=255)),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'pdf_cache_entries',
+                'indexes': [models.Index(fields=['last_used_at'], name='pdf_cache_last_used')],
+            },
+        ),
+    ]
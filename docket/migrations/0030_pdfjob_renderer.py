@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docket', '0029_pdfcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfjob',
+            name='renderer',
+            field=models.CharField(blank=True, default='', help_text='Blank uses the PDF_RENDERER setting', max_length=20),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models import Q
 from authentication.models import User
 from django.utils import timezone
 from decimal import Decimal
+from .ledger import LedgerState, payoff_as_of
 
 
 class CaseDetails(models.Model):
@@ -15,11 +17,13 @@ class CaseDetails(models.Model):
     judgment_date = models.DateField()
 
     last_payment_date = models.DateField(null=True, blank=True)
+    last_transaction_date = models.DateField(null=True, blank=True)
     total_payments = models.DecimalField(max_digits=20, decimal_places=10, default=Decimal('0.00'))
     accrued_interest = models.DecimalField(max_digits=20, decimal_places=10, default=Decimal('0.00'))
     payoff_amount = models.DecimalField(max_digits=20, decimal_places=10, default=Decimal('0.00'))
     today_payoff = models.DecimalField(max_digits=20, decimal_places=10, default=Decimal('0.00'))
     debtor_info = models.TextField(null=True, blank=True)
+    ledger_version = models.PositiveIntegerField(default=0, help_text="Bumped whenever the case's transactions change")
 
     is_active = models.BooleanField(default=True)
     is_ended = models.BooleanField(default=False)
@@ -31,10 +35,24 @@ class CaseDetails(models.Model):
 
     class Meta:
         db_table = 'case_details'
+        indexes = [
+            # Case list: a user's active cases, newest first, paged on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='case_user_active_created', condition=Q(is_active=True)),
+        ]
 
     def __str__(self):
         return f"{self.case_name} - {self.court_case_number}"
 
+    def ledger_state(self):
+        """Running balances right after the case's latest transaction."""
+        if self.last_transaction_date is None:
+            return LedgerState.opening(self.judgment_amount, self.judgment_date)
+        return LedgerState(self.last_transaction_date, self.payoff_amount - self.accrued_interest, self.accrued_interest)
+
+    @property
+    def current_payoff(self):
+        return payoff_as_of(self.ledger_state(), self.interest_rate, timezone.now().date())
+
 
 class Transaction(models.Model):
     TRANSACTION_TYPE_CHOICES = [
@@ -62,6 +80,144 @@ class Transaction(models.Model):
     class Meta:
         db_table = 'transactions'
         ordering = ['-date']
+        constraints = [
+            # Only one active transaction per day; the underlying index also serves
+            # every ledger lookup of a case's active transactions by date
+            models.UniqueConstraint(fields=['case', 'date'], condition=Q(is_active=True), name='transaction_one_per_day'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} - {self.amount} on {self.date}"
+
+
+class LedgerCheckpoint(models.Model):
+    """Snapshot of a case's running balances taken every few transactions."""
+    case = models.ForeignKey(CaseDetails, on_delete=models.CASCADE, related_name='checkpoints')
+    date = models.DateField(help_text="Date of the last transaction covered by this checkpoint")
+    principal_balance = models.DecimalField(max_digits=20, decimal_places=10)
+    accrued_interest = models.DecimalField(max_digits=20, decimal_places=10)
+    total_payments = models.DecimalField(max_digits=20, decimal_places=10)
+    last_payment_date = models.DateField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_checkpoints'
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['case', 'date'], name='ledger_checkpoint_case_date'),
+        ]
+
+    def __str__(self):
+        return f"Checkpoint {self.case_id} on {self.date}"
+
+
+class UserPortfolioSummary(models.Model):
+    """Running totals over a user's active cases, kept up to date as cases and transactions change."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='portfolio_summary')
+    total_judgments = models.DecimalField(max_digits=24, decimal_places=10, default=Decimal('0.00'))
+    total_collected = models.DecimalField(max_digits=24, decimal_places=10, default=Decimal('0.00'))
+    outstanding_payoff = models.DecimalField(
+        max_digits=24, decimal_places=10, default=Decimal('0.00'),
+        help_text="Sum of the cases' payoff after their latest transaction"
+    )
+    active_cases = models.PositiveIntegerField(default=0)
+    ended_cases = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'user_portfolio_summaries'
+
+    def __str__(self):
+        return f"Portfolio of {self.user_id}"
+
+
+class StatementBatch(models.Model):
+    """Payoff statements for several cases, rendered as one PDFJob each and downloaded together."""
+    ZIP = 'zip'
+    MERGED_PDF = 'pdf'
+
+    FORMAT_CHOICES = [
+        (ZIP, 'ZIP of PDFs'),
+        (MERGED_PDF, 'Merged PDF'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='statement_batches')
+    end_date = models.DateField()
+    format = models.CharField(max_length=3, choices=FORMAT_CHOICES, default=ZIP)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'statement_batches'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Statements as of {self.end_date} for {self.user_id}"
+
+
+class PDFJob(models.Model):
+    """A PDF document queued for rendering by the ``run_pdf_worker`` command."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    KIND_CHOICES = [
+        ('payoff_statement', 'Payoff statement'),
+        ('case_transactions', 'Case transactions'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pdf_jobs')
+    case = models.ForeignKey(CaseDetails, on_delete=models.CASCADE, related_name='pdf_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    end_date = models.DateField(null=True, blank=True)
+    renderer = models.CharField(max_length=20, blank=True, default='', help_text="Blank uses the PDF_RENDERER setting")
+    batch = models.ForeignKey(StatementBatch, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # Kept in the database so web and worker processes need no shared filesystem
+    pdf = models.BinaryField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'pdf_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='pdf_job_status_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for case {self.case_id} ({self.status})"
+
+
+class PDFCacheEntry(models.Model):
+    """
+    A rendered PDF kept in the PDF cache storage. The rows record size and
+    last use so the cache can be trimmed least recently used first.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, help_text="File name in the PDF cache storage")
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'pdf_cache_entries'
+        indexes = [
+            models.Index(fields=['last_used_at'], name='pdf_cache_last_used'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.size} bytes)"
@@ -0,0 +1,99 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    # Padding is dropped so the cursor can go in a query string as is
+    return base64.urlsafe_b64encode(json.dumps(values, default=lambda value: value.isoformat()).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor.')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor.')
+    return values
+
+
+def page_params(request):
+    """
+    ``(limit, cursor)`` from the ``?limit=`` and ``?cursor=`` query parameters,
+    or None when the client did not ask for a page. Raises ValueError on bad input.
+    """
+    limit = request.query_params.get('limit')
+    cursor = request.query_params.get('cursor')
+    if limit is None and cursor is None:
+        return None
+
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be a whole number.')
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}.')
+
+    return limit, cursor
+
+
+def keyset_page(queryset, ordering, limit, cursor=None):
+    """
+    One page of ``queryset`` sorted by ``ordering`` (field names, prefixed with
+    '-' for descending, the last one unique) starting after ``cursor``.
+
+    The position is carried in the cursor as the ordering values of the last
+    row served, so each page is a single range scan on an index matching
+    ``ordering`` no matter how deep it is. Returns the rows and the cursor of
+    the next page, None on the last one.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(ordering):
+            raise ValueError('Invalid cursor.')
+        values = [_cursor_value(queryset.model, field, value) for field, value in zip(ordering, values)]
+        queryset = queryset.filter(_after(ordering, values))
+
+    # The cursor is built from the ordering fields, keep them loaded under .only()
+    only, deferring = queryset.query.deferred_loading
+    if only and not deferring:
+        queryset = queryset.only(*only, *(field.lstrip('-') for field in ordering))
+
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], field.lstrip('-')) for field in ordering])
+
+
+def _cursor_value(model, field, value):
+    # Cursors come from the client, so each value must parse as its ordering field
+    try:
+        value = model._meta.get_field(field.lstrip('-')).to_python(value)
+    except (ValidationError, TypeError, ValueError):
+        raise ValueError('Invalid cursor.')
+    if value is None:
+        raise ValueError('Invalid cursor.')
+    return value
+
+
+def _after(ordering, values):
+    # (a, b) comes after (x, y) when a is past x, or a equals x and b is past y
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
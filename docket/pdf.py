@@ -0,0 +1,229 @@
+import logging
+import time
+import zipfile
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.template.loader import get_template, render_to_string
+from django.utils.timezone import now
+from pypdf import PdfWriter
+from xhtml2pdf import pisa
+from .logos import logo_link_callback
+from .pdf_reportlab import draw_case_transactions, draw_payoff_statement
+from .models import CaseDetails, Transaction
+from .services import ledger_timeline, payoff_summary
+
+
+logger = logging.getLogger(__name__)
+
+PAYOFF_STATEMENT = 'payoff_statement'
+CASE_TRANSACTIONS = 'case_transactions'
+
+TEMPLATES = {
+    PAYOFF_STATEMENT: 'docket/payoff_statement.html',
+    CASE_TRANSACTIONS: 'docket/case_transactions.html',
+}
+
+# Renderers: the HTML templates through xhtml2pdf, or the same layouts drawn
+# directly with ReportLab, which skips parsing HTML and CSS on every request
+XHTML2PDF = 'xhtml2pdf'
+REPORTLAB = 'reportlab'
+RENDERERS = (XHTML2PDF, REPORTLAB)
+
+REPORTLAB_LAYOUTS = {
+    PAYOFF_STATEMENT: draw_payoff_statement,
+    CASE_TRANSACTIONS: draw_case_transactions,
+}
+
+
+class PDFRenderError(Exception):
+    """Raised when xhtml2pdf fails to produce a document."""
+
+
+# Context builders. They only shape data that has already been loaded, so the
+# same documents can be rendered on the request thread or by the PDF worker.
+
+def lawyer_context(user, today):
+    # Lawyer details from the user requesting the statement
+    return {
+        'name': user.full_name or f"{user.first_name} {user.last_name}",
+        'firm': user.company or "Law Firm",
+        'address': user.location or "N/A",
+        'city_state_zip': f"{user.state or ''}, {user.country or ''} {user.postal_code or ''}".strip(', '),
+        'phone': user.phone_number or "N/A",
+        'email': user.email,
+        'image': user.image,
+        'date': today.strftime('%B %d, %Y')
+    }
+
+
+def payoff_statement_context(case, user, end_date, transactions, payoff, today):
+    return {
+        'case': case,
+        'debtor_info': case.debtor_info,
+        'transactions': transactions,
+        'daily_interest': f"{payoff['daily_interest']:.2f}",
+        'interest_start_date': end_date,
+        'today': end_date,
+        'payoff_amount': f"{payoff['payoff_amount']:.2f}",
+        'accrued_interest': f"{payoff['accrued_interest']:.2f}",
+        'lawyer': lawyer_context(user, today),
+    }
+
+
+def case_transactions_context(case, transactions, today):
+    return {
+        'case': case,
+        'transactions': transactions,
+        'today': today
+    }
+
+
+def html_to_pdf(html):
+    pdf_file = BytesIO()
+    pisa_status = pisa.CreatePDF(src=html, dest=pdf_file, link_callback=logo_link_callback)
+    if pisa_status.err:
+        raise PDFRenderError('Failed to generate PDF')
+    return pdf_file.getvalue()
+
+
+def pdf_renderer(name=None):
+    """The renderer called ``name``, or the PDF_RENDERER setting when not given; raises ValueError if unknown."""
+    renderer = name or settings.PDF_RENDERER
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown PDF renderer '{renderer}'. Use one of: {', '.join(RENDERERS)}.")
+    return renderer
+
+
+def render_context(kind, context, renderer=None):
+    """PDF bytes of document ``kind`` drawn from ``context``."""
+    if pdf_renderer(renderer) == REPORTLAB:
+        return REPORTLAB_LAYOUTS[kind](context)
+    return html_to_pdf(render_to_string(TEMPLATES[kind], context))
+
+
+def statement_transactions(case, end_date=None):
+    """Active transactions of ``case`` in date order, up to ``end_date`` when given."""
+    transactions = ledger_timeline(case)
+    if end_date:
+        transactions = [tx for tx in transactions if tx.date <= end_date]
+    return transactions
+
+
+def document_date(kind):
+    """The date printed on a document of ``kind`` rendered now."""
+    if kind == PAYOFF_STATEMENT:
+        return now().date()
+    return date.today()
+
+
+def render_payoff_statement(case, user, end_date, today=None, renderer=None):
+    # Payoff on end_date: balances after the last transaction plus interest accrued since
+    context = payoff_statement_context(
+        case, user, end_date, statement_transactions(case, end_date), payoff_summary(case, end_date),
+        today or document_date(PAYOFF_STATEMENT)
+    )
+    return render_context(PAYOFF_STATEMENT, context, renderer)
+
+
+def render_case_transactions(case, end_date=None, today=None, renderer=None):
+    context = case_transactions_context(
+        case, statement_transactions(case, end_date), today or document_date(CASE_TRANSACTIONS)
+    )
+    return render_context(CASE_TRANSACTIONS, context, renderer)
+
+
+def render_document(kind, case, user, end_date, today=None, renderer=None):
+    """PDF bytes of document ``kind`` (PAYOFF_STATEMENT or CASE_TRANSACTIONS)."""
+    if kind == PAYOFF_STATEMENT:
+        return render_payoff_statement(case, user, end_date, today, renderer)
+    return render_case_transactions(case, end_date, today, renderer)
+
+
+def document_filename(kind, case_id):
+    if kind == PAYOFF_STATEMENT:
+        return f'payoff_statement_case_{case_id}.pdf'
+    return f'case_{case_id}_transactions.pdf'
+
+
+class _ZipChunks:
+    """Write-only file that hands what zipfile wrote so far to a streaming response."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_stream(files):
+    """
+    Yields a ZIP archive of ``(name, data)`` pairs piece by piece, so only one
+    file is held at a time. PDFs are stored uncompressed: their content
+    streams are compressed already.
+    """
+    chunks = _ZipChunks()
+    with zipfile.ZipFile(chunks, 'w', zipfile.ZIP_STORED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            yield chunks.drain()
+    yield chunks.drain()
+
+
+def merge_pdfs(pdfs):
+    """One PDF with the pages of each of ``pdfs`` in turn."""
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(BytesIO(pdf))
+    merged = BytesIO()
+    writer.write(merged)
+    return merged.getvalue()
+
+
+def sample_contexts(today):
+    """A made-up context for each kind of document, touching no database tables."""
+    case = CaseDetails(
+        id=0, case_name='Sample v. Case', court_name='Sample Court', court_case_number='SAMPLE-1',
+        judgment_amount=Decimal('1000.00'), judgment_date=today, interest_rate=Decimal('9.000000'),
+        debtor_info='Sample debtor',
+    )
+    transactions = [Transaction(
+        id=0, transaction_type='PAYMENT', amount=Decimal('100.00'), date=today,
+        accrued_interest=Decimal('0.00'), principal_balance=Decimal('900.00'),
+    )]
+    payoff = {'daily_interest': Decimal('0.22'), 'payoff_amount': Decimal('900.00'), 'accrued_interest': Decimal('0.00')}
+    user = get_user_model()(email='sample@example.com', image='')
+    return {
+        PAYOFF_STATEMENT: payoff_statement_context(case, user, today, transactions, payoff, today),
+        CASE_TRANSACTIONS: case_transactions_context(case, transactions, today),
+    }
+
+
+def warm_up():
+    """
+    Compiles the templates and renders a sample of each document with the
+    default renderer, so the first statement a process serves doesn't pay
+    for xhtml2pdf's and ReportLab's lazy imports and font metrics. Run from
+    DocketConfig.ready() when PDF_WARMUP is set; never fails the start.
+    """
+    started = time.perf_counter()
+    try:
+        for name in TEMPLATES.values():
+            get_template(name)
+        for kind, context in sample_contexts(date.today()).items():
+            render_context(kind, context)
+    except Exception:
+        logger.warning("PDF warm-up failed.", exc_info=True)
+        return
+    logger.info("Warmed up PDF rendering in %.2fs.", time.perf_counter() - started)
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+from functools import cache
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.template.loader import get_template
+from django.utils import timezone
+from .logos import JUDGMENTCALC_LOGO_URL, cached_logo
+from .models import PDFCacheEntry
+from .pdf import PAYOFF_STATEMENT, TEMPLATES, render_document
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when a change to the context builders, the ReportLab layouts or the streamed layout alters
+# documents without touching the templates
+RENDER_VERSION = 3
+
+# Everything from the case and the lawyer's profile that is printed on a document
+CASE_KEY_FIELDS = (
+    'case_name', 'court_name', 'court_case_number', 'judgment_amount', 'judgment_date', 'interest_rate', 'debtor_info',
+)
+LAWYER_KEY_FIELDS = (
+    'full_name', 'first_name', 'last_name', 'company', 'location', 'state', 'country', 'postal_code',
+    'phone_number', 'email', 'image',
+)
+
+
+@cache
+def pdf_cache_storage():
+    return storages.create_storage(settings.PDF_CACHE_STORAGE)
+
+
+@cache
+def template_version(kind):
+    """Hash of the template source, so editing a template retires its cached documents."""
+    source = get_template(TEMPLATES[kind]).template.source
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def document_key(kind, case, user, end_date, today, renderer):
+    """
+    Content address of a document: the same key always renders the same PDF.
+    ``ledger_version`` stands in for the transactions, which change only
+    together with it.
+    """
+    parts = {
+        'render': RENDER_VERSION,
+        'template': template_version(kind),
+        'kind': kind,
+        'renderer': renderer,
+        'case': case.id,
+        'ledger_version': case.ledger_version,
+        'case_fields': [getattr(case, field) for field in CASE_KEY_FIELDS],
+        'end_date': end_date,
+        'today': today,
+    }
+    if kind == PAYOFF_STATEMENT:
+        parts['lawyer'] = [getattr(user, field) for field in LAWYER_KEY_FIELDS]
+        logo = user.image
+    else:
+        logo = JUDGMENTCALC_LOGO_URL
+    # A document rendered before its logo was cached doesn't show it
+    parts['logo_cached'] = cached_logo(logo) is not None
+
+    encoded = json.dumps(parts, default=str, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def get_cached_pdf(key):
+    """The cached PDF stored under ``key`` or None, marking it as just used."""
+    entry = PDFCacheEntry.objects.filter(key=key).only('name').first()
+    if entry is None:
+        return None
+
+    try:
+        with pdf_cache_storage().open(entry.name, 'rb') as f:
+            pdf = f.read()
+    except OSError:
+        # Evicted by another process in the meantime, or lost from the storage
+        PDFCacheEntry.objects.filter(key=key).delete()
+        return None
+
+    PDFCacheEntry.objects.filter(key=key).update(last_used_at=timezone.now())
+    return pdf
+
+
+def store_pdf(key, pdf):
+    """Caches ``pdf`` under ``key``. A storage that can't be written to only costs the cache, never the request."""
+    storage = pdf_cache_storage()
+    try:
+        name = storage.save(f'{key[:2]}/{key}.pdf', ContentFile(pdf))
+    except OSError:
+        logger.exception("Could not write PDF %s to the cache.", key)
+        return
+    try:
+        with transaction.atomic():
+            PDFCacheEntry.objects.create(key=key, name=name, size=len(pdf))
+    except IntegrityError:
+        # Another process cached the same document first
+        storage.delete(name)
+        return
+
+    evict_pdf_cache(settings.PDF_CACHE_MAX_BYTES)
+
+
+def evict_pdf_cache(max_bytes):
+    """Deletes least recently used PDFs until the cache is at most ``max_bytes``. Returns the number deleted."""
+    total = PDFCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+    if total <= max_bytes:
+        return 0
+
+    storage = pdf_cache_storage()
+    evicted = 0
+    for entry in PDFCacheEntry.objects.order_by('last_used_at').only('key', 'name', 'size').iterator():
+        if total <= max_bytes:
+            break
+        # Drop the row first so no reader picks up a file that is about to go
+        if PDFCacheEntry.objects.filter(key=entry.key).delete()[0]:
+            storage.delete(entry.name)
+            evicted += 1
+        total -= entry.size
+
+    logger.info("Evicted %s PDFs from the cache.", evicted)
+    return evicted
+
+
+def render_cached(kind, case, user, end_date, today, renderer, key=None):
+    """PDF bytes of a document, rendered only when the cache doesn't already hold it."""
+    key = key or document_key(kind, case, user, end_date, today, renderer)
+    pdf = get_cached_pdf(key)
+    if pdf is None:
+        pdf = render_document(kind, case, user, end_date, today, renderer)
+        store_pdf(key, pdf)
+    return pdf
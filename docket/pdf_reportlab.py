@@ -0,0 +1,255 @@
+from decimal import ROUND_HALF_UP, Decimal
+from io import BytesIO
+from xml.sax.saxutils import escape
+from django.template.defaultfilters import floatformat
+from django.utils.formats import localize
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import HRFlowable, Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from .logos import JUDGMENTCALC_LOGO_URL, cached_logo
+
+
+# Draws the payoff statement and transaction summary directly with ReportLab
+# platypus, following the layout of the HTML templates without parsing any
+# HTML or CSS. Sizes are the templates' CSS pixels at 0.75pt each.
+
+PRIMARY = colors.HexColor('#004080')
+TEXT = colors.HexColor('#333333')
+RULE = colors.HexColor('#cccccc')
+GRID = colors.HexColor('#aaaaaa')
+HEADER_BACKGROUND = colors.HexColor('#eaf2fb')
+PAYOFF_BACKGROUND = colors.HexColor('#f1f7ff')
+MUTED = colors.HexColor('#666666')
+
+# Page margins xhtml2pdf ends up with for each template
+PAYOFF_MARGINS = (2.3 * cm, 1 * cm)
+TRANSACTIONS_MARGINS = (1 * cm, 1 * cm)
+
+TITLE = ParagraphStyle('title', fontName='Helvetica-Bold', fontSize=19.5, leading=24, alignment=TA_CENTER, textColor=PRIMARY)
+SECTION_TITLE = ParagraphStyle(
+    'section-title', fontName='Helvetica', fontSize=13.5, leading=17, alignment=TA_CENTER, textColor=PRIMARY
+)
+BODY = ParagraphStyle('body', fontName='Helvetica', fontSize=9.75, leading=15.6, textColor=TEXT)
+CENTERED = ParagraphStyle('centered', parent=BODY, fontSize=10.5, leading=14, alignment=TA_CENTER, spaceAfter=8)
+INFO_TEXT = ParagraphStyle('info-text', parent=CENTERED, fontSize=9.75)
+CASE_INFO = ParagraphStyle('case-info', parent=BODY, fontSize=10.5, leading=14, spaceAfter=4.5)
+PAYOFF = ParagraphStyle(
+    'payoff', fontName='Helvetica-Bold', fontSize=12, leading=16, alignment=TA_CENTER, textColor=PRIMARY
+)
+FOOTER = ParagraphStyle('footer', parent=BODY, fontSize=9, leading=14.4, spaceAfter=7.5)
+GENERATED_BY = ParagraphStyle('generated-by', parent=BODY, fontSize=8.25, alignment=TA_CENTER, textColor=MUTED)
+
+TRANSACTION_HEADERS = ['Date', 'Type', 'Amount', 'Accrued Interest', 'Principal Balance']
+ROW_HEIGHT = 18
+_CENT = Decimal('0.01')
+
+def logo_flowable(url, width=None, height=None):
+    """
+    The cached logo at ``url`` at the given width or height, keeping its
+    aspect ratio, or '' when it isn't cached and is left out.
+    """
+    path = cached_logo(url)
+    if path is None:
+        return ''
+
+    image_width, image_height = ImageReader(path).getSize()
+    if width is None:
+        width = height * image_width / image_height
+    else:
+        height = width * image_height / image_width
+    return Image(path, width=width, height=height)
+
+
+def text(value):
+    """``value`` as Paragraph markup, with line breaks kept like |linebreaksbr."""
+    return escape(str(value)).replace('\r\n', '\n').replace('\n', '<br/>')
+
+
+def money(value):
+    """``value`` formatted like ${{ value|floatformat:"2" }}; only for Decimals, which skips the filter's own parsing."""
+    return f"${value.quantize(_CENT, rounding=ROUND_HALF_UP):f}"
+
+
+def section_title(title):
+    # xhtml2pdf ignores the template's text-transform, so titles aren't uppercased
+    return [
+        Spacer(1, 30),
+        HRFlowable(width='100%', thickness=0.75, color=RULE, spaceAfter=7.5),
+        Paragraph(title, SECTION_TITLE),
+        Spacer(1, 7.5),
+    ]
+
+
+def build(flowables, title, margins):
+    side, top = margins
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, title=title, leftMargin=side, rightMargin=side, topMargin=top, bottomMargin=top,
+    )
+    doc.build(flowables)
+    return buffer.getvalue()
+
+
+def draw_payoff_statement(context):
+    """PDF bytes of docket/payoff_statement.html drawn from the same context."""
+    case = context['case']
+    lawyer = context['lawyer']
+    width = A4[0] - 2 * PAYOFF_MARGINS[0]
+
+    # 1. Title with a rule under it
+    flowables = [
+        Paragraph('Payoff Statement', TITLE),
+        HRFlowable(width='100%', thickness=1.5, color=PRIMARY, spaceBefore=15, spaceAfter=37.5),
+    ]
+
+    # 2. Lawyer and debtor details, with the lawyer's logo on the right
+    details = [Paragraph(
+        f"<b>{text(lawyer['name'])}</b><br/>{text(lawyer['firm'])}<br/>{text(lawyer['address'])}<br/>"
+        f"{text(lawyer['city_state_zip'])}<br/>Tel: {text(lawyer['phone'])}<br/>Email: {text(lawyer['email'])}",
+        BODY
+    )]
+    if context['debtor_info']:
+        details += [Spacer(1, 10), Paragraph(
+            f"<b>Debtor Information:</b><br/>{text(context['debtor_info'])}<br/>"
+            f"<b>Phone:</b> <br/><b>Email:</b> <br/><b>Date:</b> {text(lawyer['date'])}",
+            BODY
+        )]
+    header = Table(
+        [[details, logo_flowable(lawyer['image'], width=90)]],
+        colWidths=[width * 0.65, width * 0.35]
+    )
+    header.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ]))
+    flowables.append(header)
+
+    # 3. Case details
+    flowables += section_title('Case Details')
+    flowables += [
+        Paragraph(f"<b>{text(case.case_name)}</b>", CENTERED),
+        Paragraph(f"{text(case.court_name)} - Case No. {text(case.court_case_number)}", CENTERED),
+        Paragraph(
+            f"<b>Judgment Amount:</b> ${floatformat(case.judgment_amount, '2')} "
+            f"(entered {text(localize(case.judgment_date))})",
+            CENTERED
+        ),
+    ]
+
+    # 4. Payoff box
+    flowables += section_title('Total Payoff')
+    flowables.append(Spacer(1, 30))
+    payoff = Table([[Paragraph(
+        f"${floatformat(context['payoff_amount'], '2')}<br/>"
+        f"<font name=\"Helvetica\" size=\"9\">As of {text(localize(context['today']))}</font>",
+        PAYOFF
+    )]], colWidths=[200])
+    payoff.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 1.5, PRIMARY),
+        ('BACKGROUND', (0, 0), (-1, -1), PAYOFF_BACKGROUND),
+        ('TOPPADDING', (0, 0), (-1, -1), 3.75),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 7.5),
+    ]))
+    flowables.append(payoff)
+
+    # 5. Daily interest and payment instructions
+    flowables += [
+        Spacer(1, 22.5),
+        Paragraph(
+            f"Interest accrues at a daily rate of <b>${floatformat(context['daily_interest'], '2')}</b> per day after "
+            f"<b>{text(localize(context['interest_start_date']))}</b>.",
+            INFO_TEXT
+        ),
+        Spacer(1, 37.5),
+        Paragraph("Please ensure your payment reaches our office by the stated date.", FOOTER),
+        Paragraph(
+            "If paying by check, mail it to the address listed. For wire instructions, contact our office.", FOOTER
+        ),
+    ]
+    return build(flowables, 'Payoff Statement', PAYOFF_MARGINS)
+
+
+def draw_case_transactions(context):
+    """PDF bytes of docket/case_transactions.html drawn from the same context."""
+    case = context['case']
+    width = A4[0] - 2 * TRANSACTIONS_MARGINS[0]
+
+    # 1. JudgmentCalc logo on the left, title centred on the page
+    header = Table(
+        [[logo_flowable(JUDGMENTCALC_LOGO_URL, height=37.5), Paragraph('Transaction Summary', TITLE), '']],
+        colWidths=[width * 0.25, width * 0.5, width * 0.25], rowHeights=[52.5]
+    )
+    header.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ]))
+    flowables = [header, Spacer(1, 7.5)]
+
+    # 2. Case details
+    flowables += [
+        Paragraph(f"<b>Case:</b> {text(case.case_name)}", CASE_INFO),
+        Paragraph(f"<b>Court Case Number:</b> {text(case.court_case_number)}", CASE_INFO),
+        Paragraph(f"<b>Judgment Amount:</b> ${floatformat(case.judgment_amount, '2')}", CASE_INFO),
+        Paragraph(f"<b>Judgment Date:</b> {text(localize(case.judgment_date))}", CASE_INFO),
+        Spacer(1, 15),
+    ]
+
+    # 3. Transactions. Plain strings keep the table cheap to lay out on
+    # long ledgers; the header row is repeated on every page.
+    rows = [TRANSACTION_HEADERS]
+    for txn in context['transactions']:
+        rows.append([
+            txn.date.strftime('%m-%d,%Y'),
+            txn.transaction_type,
+            money(txn.amount),
+            money(txn.accrued_interest),
+            money(txn.principal_balance),
+        ])
+
+    style = [
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9.75),
+        ('TEXTCOLOR', (0, 0), (-1, -1), TEXT),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('GRID', (0, 0), (-1, -1), 0.75, GRID),
+        ('TOPPADDING', (0, 0), (-1, -1), 2.5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ('TOPPADDING', (0, 0), (-1, 0), 3.75),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('TEXTCOLOR', (0, 0), (-1, 0), PRIMARY),
+        ('BACKGROUND', (0, 0), (-1, 0), HEADER_BACKGROUND),
+    ]
+    row_heights = [ROW_HEIGHT] * len(rows)
+    if len(rows) == 1:
+        rows.append(['No transactions available for this case.', '', '', '', ''])
+        row_heights.append(45)
+        style += [
+            ('SPAN', (0, 1), (-1, 1)),
+            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Oblique'),
+            ('TEXTCOLOR', (0, 1), (-1, 1), colors.HexColor('#888888')),
+            ('TOPPADDING', (0, 1), (-1, 1), 15),
+            ('BOTTOMPADDING', (0, 1), (-1, 1), 15),
+        ]
+
+    # Fixed row heights spare the table from measuring every remaining row
+    # each time it splits across a page
+    table = Table(rows, colWidths=[width / 5] * 5, rowHeights=row_heights, repeatRows=1)
+    table.setStyle(TableStyle(style))
+    flowables.append(table)
+
+    # 4. Footer
+    flowables += [
+        Spacer(1, 30),
+        Paragraph(
+            f'Generated by <a href="http://judgmentcalc.com/" color="blue"><u>JudgmentCalc.com</u></a> '
+            f'— {text(localize(context["today"]))}',
+            GENERATED_BY
+        ),
+    ]
+    return build(flowables, 'Case Transactions', TRANSACTIONS_MARGINS)
@@ -0,0 +1,226 @@
+import zlib
+from array import array
+from django.template.defaultfilters import floatformat
+from django.utils.formats import localize
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from .logos import JUDGMENTCALC_LOGO_URL, cached_logo
+from .pdf_reportlab import ROW_HEIGHT, TRANSACTION_HEADERS, TRANSACTIONS_MARGINS, money
+
+
+# Streams the transaction summary of very long ledgers. Pages are written out
+# as soon as they are laid out, so no row content is kept once its page is
+# sent. What remains grows only with the page count: eight bytes per object
+# for the cross-reference table at the end, and per page for the page tree.
+# The layout follows draw_case_transactions().
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = TRANSACTIONS_MARGINS[0]
+TABLE_WIDTH = PAGE_WIDTH - 2 * MARGIN
+COLUMN_WIDTH = TABLE_WIDTH / len(TRANSACTION_HEADERS)
+FONT_SIZE = 9.75
+# Inner padding of the platypus frame the other layouts are drawn in
+FRAME_PADDING = 6
+
+# Fonts are the standard Type 1 ones, which need no embedding
+FONTS = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold', 'F3': 'Helvetica-Oblique'}
+
+PRIMARY = b'0 0.251 0.502'
+TEXT = b'0.2'
+GRID = b'0.667'
+HEADER_BACKGROUND = b'0.918 0.949 0.984'
+MUTED = b'0.4'
+
+
+def ledger_rows(case, end_date=None):
+    """The columns printed for each active transaction of ``case``, in date order, up to ``end_date`` when given."""
+    rows = case.transactions.filter(is_active=True)
+    if end_date:
+        rows = rows.filter(date__lte=end_date)
+    return rows.order_by('date', 'id').values_list(
+        'date', 'transaction_type', 'amount', 'accrued_interest', 'principal_balance'
+    )
+
+
+def pdf_text(value):
+    """``value`` as a PDF literal string in WinAnsiEncoding."""
+    data = str(value).encode('cp1252', errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class IncrementalPDF:
+    """
+    Writes a PDF front to back. Each method returns the bytes to send next (trailer() yields them);
+    objects are numbered up front with reserve() so pages can point at their
+    parent before it is written.
+    """
+
+    def __init__(self):
+        self.position = 0
+        # Byte offset of each object by number; object 0 is the free list head
+        self.offsets = array('Q', [0])
+
+    @property
+    def count(self):
+        return len(self.offsets)
+
+    def reserve(self):
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def _emit(self, data):
+        self.position += len(data)
+        return data
+
+    def header(self):
+        return self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def object(self, number, body):
+        self.offsets[number] = self.position
+        return self._emit(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def stream(self, number, data, entries=b''):
+        return self.object(number, b'<< /Length %d %s>>\nstream\n%s\nendstream' % (len(data), entries, data))
+
+    def trailer(self, root, block=1000):
+        """Yields the cross-reference table and trailer, ``block`` entries at a time."""
+        xref = self.position
+        yield self._emit(b'xref\n0 %d\n0000000000 65535 f \n' % self.count)
+        for start in range(1, self.count, block):
+            yield self._emit(b''.join(b'%010d 00000 n \n' % offset for offset in self.offsets[start:start + block]))
+        yield self._emit(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.count, root, xref))
+
+
+class _Page:
+    """Drawing operators of one page, written out once it is full."""
+
+    def __init__(self):
+        self.ops = []
+        self.y = PAGE_HEIGHT - TRANSACTIONS_MARGINS[1] - FRAME_PADDING
+
+    def text(self, x, y, font, size, value, color=TEXT):
+        self.ops.append(b'%s rg BT /%s %.2f Tf %.2f %.2f Td %s Tj ET' % (color, font.encode(), size, x, y, pdf_text(value)))
+
+    def centered(self, center, y, font, size, value, color=TEXT):
+        self.text(center - stringWidth(value, FONTS[font], size) / 2, y, font, size, value, color)
+
+    def has_room(self, height):
+        return self.y - height >= TRANSACTIONS_MARGINS[1] + FRAME_PADDING
+
+    def row(self, cells, font='F1', color=TEXT, background=None):
+        top = self.y
+        if background:
+            self.ops.append(b'%s rg %.2f %.2f %.2f %.2f re f' % (background, MARGIN, top - ROW_HEIGHT, TABLE_WIDTH, ROW_HEIGHT))
+        for column, value in enumerate(cells):
+            self.centered(MARGIN + COLUMN_WIDTH * (column + 0.5), top - 12.5, font, FONT_SIZE, value, color)
+
+        # Cell borders: the row's box and the column separators
+        lines = [b'%s RG 0.75 w %.2f %.2f %.2f %.2f re' % (GRID, MARGIN, top - ROW_HEIGHT, TABLE_WIDTH, ROW_HEIGHT)]
+        for column in range(1, len(cells)):
+            x = MARGIN + COLUMN_WIDTH * column
+            lines.append(b'%.2f %.2f m %.2f %.2f l' % (x, top, x, top - ROW_HEIGHT))
+        self.ops.append(b' '.join(lines) + b' S')
+        self.y -= ROW_HEIGHT
+
+    def content(self):
+        return zlib.compress(b'\n'.join(self.ops))
+
+
+def logo_image(pdf, path):
+    """Object bytes of the cached logo as an image XObject; the JPEG data is embedded as it is."""
+    with Image.open(path) as image:
+        width, height = image.size
+    with open(path, 'rb') as f:
+        data = f.read()
+    number = pdf.reserve()
+    entries = b'/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode ' % (width, height)
+    return number, width / height, pdf.stream(number, data, entries)
+
+
+def stream_case_transactions(case, rows, today):
+    """
+    Yields the transaction summary of ``case`` piece by piece. ``rows`` are
+    ledger_rows() tuples and are consumed one at a time, so they can come
+    straight from a database iterator.
+    """
+    pdf = IncrementalPDF()
+    catalog = pdf.reserve()
+    pages = pdf.reserve()
+    resources = pdf.reserve()
+    page_numbers = array('Q')
+    yield pdf.header()
+
+    # 1. Shared resources: fonts and the JudgmentCalc logo when it is cached
+    fonts = []
+    for name, base_font in FONTS.items():
+        number = pdf.reserve()
+        fonts.append(b'/%s %d 0 R' % (name.encode(), number))
+        yield pdf.object(number, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base_font.encode())
+    logo = cached_logo(JUDGMENTCALC_LOGO_URL)
+    xobjects = b''
+    if logo:
+        logo_number, logo_ratio, data = logo_image(pdf, logo)
+        xobjects = b'/XObject << /Im1 %d 0 R >>' % logo_number
+        yield data
+    yield pdf.object(resources, b'<< /Font << %s >> %s >>' % (b' '.join(fonts), xobjects))
+
+    def finish(page):
+        number = pdf.reserve()
+        content = pdf.reserve()
+        page_numbers.append(number)
+        return pdf.stream(content, page.content(), b'/Filter /FlateDecode ') + pdf.object(number, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Resources %d 0 R /Contents %d 0 R >>'
+            % (pages, PAGE_WIDTH, PAGE_HEIGHT, resources, content)
+        ))
+
+    def table_header(page):
+        page.row(TRANSACTION_HEADERS, font='F2', color=PRIMARY, background=HEADER_BACKGROUND)
+
+    # 2. Title and case details on the first page
+    page = _Page()
+    if logo:
+        page.ops.append(b'q %.2f 0 0 37.5 %.2f %.2f cm /Im1 Do Q' % (37.5 * logo_ratio, MARGIN + FRAME_PADDING, page.y - 45))
+    page.centered(PAGE_WIDTH / 2, page.y - 33, 'F2', 19.5, 'Transaction Summary', PRIMARY)
+    page.y -= 60
+    for label, value in (
+        ('Case:', case.case_name),
+        ('Court Case Number:', case.court_case_number),
+        ('Judgment Amount:', f"${floatformat(case.judgment_amount, '2')}"),
+        ('Judgment Date:', localize(case.judgment_date)),
+    ):
+        page.text(MARGIN + FRAME_PADDING, page.y - 10.5, 'F2', 10.5, label)
+        page.text(MARGIN + FRAME_PADDING + stringWidth(label + ' ', FONTS['F2'], 10.5), page.y - 10.5, 'F1', 10.5, value)
+        page.y -= 18.5
+    page.y -= 15
+    table_header(page)
+
+    # 3. Transaction rows, a page at a time
+    empty = True
+    for tx_date, transaction_type, amount, accrued_interest, principal_balance in rows:
+        empty = False
+        if not page.has_room(ROW_HEIGHT):
+            yield finish(page)
+            page = _Page()
+            table_header(page)
+        page.row([
+            tx_date.strftime('%m-%d,%Y'), transaction_type, money(amount), money(accrued_interest), money(principal_balance)
+        ])
+
+    if empty:
+        top = page.y
+        page.ops.append(b'%s RG 0.75 w %.2f %.2f %.2f 45 re S' % (GRID, MARGIN, top - 45, TABLE_WIDTH))
+        page.centered(PAGE_WIDTH / 2, top - 26, 'F3', FONT_SIZE, 'No transactions available for this case.', b'0.533')
+        page.y -= 45
+
+    # 4. Footer, then the page tree and the cross-reference table
+    if not page.has_room(40):
+        yield finish(page)
+        page = _Page()
+    page.centered(PAGE_WIDTH / 2, page.y - 38, 'F1', 8.25, f"Generated by JudgmentCalc.com — {localize(today)}", MUTED)
+    yield finish(page)
+
+    kids = b' '.join(b'%d 0 R' % number for number in page_numbers)
+    yield pdf.object(pages, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_numbers)))
+    yield pdf.object(catalog, b'<< /Type /Catalog /Pages %d 0 R >>' % pages)
+    yield from pdf.trailer(catalog)
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import CaseDetails, Transaction
-from decimal import Decimal
+from .ledger import batch_payoffs_as_of
+from .models import CaseDetails, PDFJob, StatementBatch, Transaction, UserPortfolioSummary
+from .pdf import RENDERERS
+from decimal import ROUND_HALF_EVEN, Decimal
 
 class NullableDateField(serializers.DateField):
     def to_internal_value(self, value):
@@ -8,6 +10,35 @@ class NullableDateField(serializers.DateField):
             return None
         return super().to_internal_value(value)
 
+class SparseFieldsMixin:
+    """
+    Serializes only the fields listed in ``context['fields']`` when given.
+
+    ``Meta.field_columns`` names the model fields read by fields that are not
+    backed by a single model field, so views can load just those with ``.only()``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('fields')
+        if selected:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+    @classmethod
+    def columns(cls, names):
+        """Model fields needed to serialize ``names``; raises ValueError for unknown ones."""
+        declared = cls().fields
+        unknown = [name for name in names if name not in declared]
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}.')
+
+        field_columns = getattr(cls.Meta, 'field_columns', {})
+        columns = {'id'}
+        for name in names:
+            columns.update(field_columns.get(name, [declared[name].source]))
+        return columns
+
 class CaseCreateSerializer(serializers.ModelSerializer):
     caseName = serializers.CharField()
     courtName = serializers.CharField()
@@ -48,15 +79,20 @@ class CaseCreateSerializer(serializers.ModelSerializer):
         return data
 
 
-class CaseListSerializer(serializers.ModelSerializer):
+class CaseListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     caseName = serializers.CharField(source='case_name')
     courtName = serializers.CharField(source='court_name')
     courtCaseNumber = serializers.CharField(source='court_case_number')
-    payoffAmount = serializers.DecimalField(source='payoff_amount', max_digits=20, decimal_places=10)
+    payoffAmount = serializers.DecimalField(source='current_payoff', max_digits=20, decimal_places=10)
 
     class Meta:
         model = CaseDetails
         fields = ['id', 'caseName', 'courtName', 'courtCaseNumber', 'payoffAmount']
+        field_columns = {
+            'payoffAmount': [
+                'judgment_amount', 'judgment_date', 'interest_rate', 'last_transaction_date', 'payoff_amount', 'accrued_interest'
+            ],
+        }
 
 class CaseDetailSerializer(serializers.ModelSerializer):
     caseName = serializers.CharField(source='case_name')
@@ -69,7 +105,7 @@ class CaseDetailSerializer(serializers.ModelSerializer):
     totalPayments = serializers.DecimalField(source='total_payments', max_digits=20, decimal_places=10)
     accruedInterest = serializers.DecimalField(source='accrued_interest', max_digits=20, decimal_places=10)
     principalBalance = serializers.SerializerMethodField()
-    payoffAmount = serializers.DecimalField(source='today_payoff', max_digits=20, decimal_places=10)
+    payoffAmount = serializers.DecimalField(source='current_payoff', max_digits=20, decimal_places=10)
 
     class Meta:
         model = CaseDetails
@@ -92,6 +128,67 @@ class CaseDetailSerializer(serializers.ModelSerializer):
         # Principal = judgment_amount - total_payments
         return obj.judgment_amount - obj.total_payments
 
+class PayoffSerializer(serializers.Serializer):
+    caseId = serializers.IntegerField(source='case_id')
+    date = serializers.DateField()
+    interestStartDate = serializers.DateField(source='interest_start_date')
+    principalBalance = serializers.DecimalField(source='principal', max_digits=20, decimal_places=10)
+    accruedInterest = serializers.DecimalField(source='accrued_interest', max_digits=20, decimal_places=10)
+    dailyInterest = serializers.DecimalField(source='daily_interest', max_digits=20, decimal_places=10)
+    payoffAmount = serializers.DecimalField(source='payoff_amount', max_digits=20, decimal_places=10)
+
+class PortfolioSummarySerializer(serializers.ModelSerializer):
+    totalJudgments = serializers.DecimalField(source='total_judgments', max_digits=24, decimal_places=10)
+    totalCollected = serializers.DecimalField(source='total_collected', max_digits=24, decimal_places=10)
+    outstandingPayoff = serializers.DecimalField(source='outstanding_payoff', max_digits=24, decimal_places=10)
+    activeCases = serializers.IntegerField(source='active_cases')
+    endedCases = serializers.IntegerField(source='ended_cases')
+    updatedAt = serializers.DateTimeField(source='updated_at')
+
+    class Meta:
+        model = UserPortfolioSummary
+        fields = ['totalJudgments', 'totalCollected', 'outstandingPayoff', 'activeCases', 'endedCases', 'updatedAt']
+
+class PDFJobSerializer(serializers.ModelSerializer):
+    jobId = serializers.IntegerField(source='id')
+    caseId = serializers.IntegerField(source='case_id')
+    endDate = serializers.DateField(source='end_date')
+    createdAt = serializers.DateTimeField(source='created_at')
+    finishedAt = serializers.DateTimeField(source='finished_at')
+
+    class Meta:
+        model = PDFJob
+        fields = ['jobId', 'caseId', 'kind', 'renderer', 'endDate', 'status', 'error', 'createdAt', 'finishedAt']
+
+class StatementBatchCreateSerializer(serializers.Serializer):
+    case_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    all_active = serializers.BooleanField(default=False)
+    date = serializers.DateField(required=False)
+    format = serializers.ChoiceField(choices=StatementBatch.FORMAT_CHOICES, default=StatementBatch.ZIP)
+    renderer = serializers.ChoiceField(choices=RENDERERS, required=False)
+
+    def validate(self, data):
+        if data['all_active'] == ('case_ids' in data):
+            raise serializers.ValidationError("Provide either case_ids or all_active.")
+        return data
+
+class StatementBatchSerializer(serializers.ModelSerializer):
+    """A StatementBatch annotated by jobs.with_progress()."""
+    batchId = serializers.IntegerField(source='id')
+    endDate = serializers.DateField(source='end_date')
+    status = serializers.SerializerMethodField()
+    total = serializers.IntegerField()
+    done = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    createdAt = serializers.DateTimeField(source='created_at')
+
+    class Meta:
+        model = StatementBatch
+        fields = ['batchId', 'format', 'endDate', 'status', 'total', 'done', 'failed', 'createdAt']
+
+    def get_status(self, obj):
+        return 'done' if obj.done + obj.failed == obj.total else 'running'
+
 class TransactionCreateSerializer(serializers.Serializer):
     case_id = serializers.IntegerField()
     transaction_type = serializers.ChoiceField(choices=['PAYMENT', 'COST'])
@@ -105,6 +202,12 @@ class TransactionCreateSerializer(serializers.Serializer):
         if not CaseDetails.objects.filter(id=value, user=request.user, is_active=True).exists():
             raise serializers.ValidationError("Case not found or access denied.")
         return value
+
+class BulkTransactionSerializer(serializers.Serializer):
+    transaction_type = serializers.ChoiceField(choices=['PAYMENT', 'COST'])
+    amount = serializers.DecimalField(max_digits=12, decimal_places=4)
+    date = serializers.DateField()
+    description = serializers.CharField(max_length=255, required=False, allow_blank=True)
     
 
 # class TransactionDetailSerializer(serializers.ModelSerializer):
@@ -120,7 +223,7 @@ class TransactionCreateSerializer(serializers.Serializer):
 #             'description',
 #         ]
 
-class TransactionDetailSerializer(serializers.ModelSerializer):
+class TransactionDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     type = serializers.CharField(source='transaction_type')
     interestRate = serializers.SerializerMethodField()
     calculatedInterest = serializers.DecimalField(source='accrued_interest', max_digits=20, decimal_places=10)
@@ -139,10 +242,17 @@ class TransactionDetailSerializer(serializers.ModelSerializer):
             'calculatedInterest',
             'newBalance',
         ]
+        field_columns = {
+            'interestRate': ['case'],
+        }
 
     def get_interestRate(self, obj):
-        # Access interest rate from related CaseDetails
-        return float(obj.case.interest_rate)
+        # Views listing a single case pass its rate in the context
+        interest_rate = self.context.get('interest_rate')
+        if interest_rate is None:
+            # Access interest rate from related CaseDetails
+            interest_rate = obj.case.interest_rate
+        return float(interest_rate)
 
 class TransactionUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -155,3 +265,65 @@ class TransactionUpdateSerializer(serializers.ModelSerializer):
             'description': {'required': False}
         }
 
+
+# Fast path for the full list endpoints. These build the same data as
+# CaseListSerializer and TransactionDetailSerializer straight from value
+# tuples, skipping model instances and DRF's per-field machinery.
+
+_TEN_PLACES = Decimal('1e-10')
+
+CASE_LIST_COLUMNS = (
+    'id', 'case_name', 'court_name', 'court_case_number', 'judgment_amount', 'judgment_date',
+    'interest_rate', 'last_transaction_date', 'payoff_amount', 'accrued_interest', 'created_at'
+)
+
+TRANSACTION_LIST_COLUMNS = (
+    'id', 'transaction_type', 'amount', 'date', 'description', 'accrued_interest', 'show_principal_balance'
+)
+
+
+def _decimal_str(value):
+    # DecimalField(max_digits=20, decimal_places=10) representation
+    return '{:f}'.format(value.quantize(_TEN_PLACES, rounding=ROUND_HALF_EVEN))
+
+
+def case_list_data(rows, today):
+    """CaseListSerializer(many=True).data for ``rows`` of CASE_LIST_COLUMNS values."""
+    rows = list(rows)
+    payoffs = batch_payoffs_as_of(
+        (
+            (judgment_amount, Decimal('0.00'), interest_rate, judgment_date) if last_transaction_date is None
+            else (payoff_amount - accrued_interest, accrued_interest, interest_rate, last_transaction_date)
+            for _, _, _, _, judgment_amount, judgment_date, interest_rate, last_transaction_date, payoff_amount, accrued_interest, _
+            in rows
+        ),
+        today
+    )
+    return [
+        {
+            'id': row[0],
+            'caseName': row[1],
+            'courtName': row[2],
+            'courtCaseNumber': row[3],
+            'payoffAmount': _decimal_str(payoff),
+        }
+        for row, payoff in zip(rows, payoffs)
+    ]
+
+
+def transaction_list_data(rows, interest_rate):
+    """TransactionDetailSerializer(many=True).data for ``rows`` of TRANSACTION_LIST_COLUMNS values."""
+    interest_rate = float(interest_rate)
+    return [
+        {
+            'id': tx_id,
+            'type': transaction_type,
+            'amount': _decimal_str(amount),
+            'date': tx_date.isoformat(),
+            'description': description,
+            'interestRate': interest_rate,
+            'calculatedInterest': _decimal_str(accrued_interest),
+            'newBalance': _decimal_str(show_principal_balance),
+        }
+        for tx_id, transaction_type, amount, tx_date, description, accrued_interest, show_principal_balance in rows
+    ]
@@ -0,0 +1,272 @@
+import threading
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .ledger import ZERO, LedgerState, daily_interest, payoff_as_of, replay
+from .models import CaseDetails, LedgerCheckpoint, Transaction, UserPortfolioSummary
+
+
+# Rows written per UPDATE statement when persisting a replay
+REPLAY_BATCH_SIZE = 500
+
+LEDGER_FIELDS = ['accrued_interest', 'principal_balance', 'show_principal_balance']
+
+
+def replay_ledger(case, from_date, new_transactions=()):
+    """
+    Recomputes the stored balances of every active transaction of ``case``
+    dated on or after ``from_date`` and refreshes the case totals.
+
+    ``new_transactions`` are unsaved transactions of ``case`` dated on or after
+    ``from_date``; they are merged into the replay by date and inserted with
+    ``bulk_create`` once their balances are known.
+
+    The replay starts from the stored balances of the last active transaction
+    before ``from_date``, which may have been entered by hand (the opening row
+    of a case added with its payment history) rather than computed. Rows are
+    read from the latest checkpoint before ``from_date`` on, so at most one
+    checkpoint interval of untouched rows is loaded besides the affected
+    suffix; the checkpoint itself (or the judgment when there is none) is the
+    starting point only when no transaction follows it before ``from_date``.
+    Rows are loaded with a single query, recalculated in memory and written
+    back with ``bulk_update``; checkpoints from ``from_date`` onwards are
+    rebuilt. Must be
+    called inside an atomic block holding a lock on the case row
+    (``select_for_update``) so concurrent writes replay one after the other;
+    raises LedgerError if the replayed ledger is invalid.
+
+    Returns the replayed transactions in date order.
+    """
+    interval = settings.LEDGER_CHECKPOINT_INTERVAL
+    share_before = portfolio_share(case)
+    rows = Transaction.objects.filter(case=case, is_active=True)
+
+    checkpoint = case.checkpoints.filter(date__lt=from_date).first()
+    if checkpoint:
+        state = LedgerState(checkpoint.date, checkpoint.principal_balance, checkpoint.accrued_interest)
+        total_payments = checkpoint.total_payments
+        last_payment_date = checkpoint.last_payment_date
+        rows = rows.filter(date__gt=checkpoint.date)
+    else:
+        state = LedgerState.opening(case.judgment_amount, case.judgment_date)
+        total_payments = Decimal('0.00')
+        last_payment_date = None
+
+    rows = list(rows.order_by('date', 'id'))
+
+    # Rows before from_date keep their stored balances, the replay starts after the last of them
+    start = 0
+    while start < len(rows) and rows[start].date < from_date:
+        start += 1
+    if start:
+        state = LedgerState.from_transaction(rows[start - 1])
+
+    suffix = rows[start:]
+    if new_transactions:
+        # sorted() is stable, so existing rows keep their relative order
+        suffix = sorted([*suffix, *new_transactions], key=lambda tx: tx.date)
+    rows = rows[:start] + suffix
+    states = [LedgerState.from_transaction(tx) for tx in rows[:start]] + replay(state, case.interest_rate, suffix)
+
+    created = []
+    changed = []
+    checkpoints = []
+    for position, (tx, tx_state) in enumerate(zip(rows, states), start=1):
+        if tx.transaction_type == 'PAYMENT':
+            total_payments += tx.amount
+            last_payment_date = tx.date
+
+        if tx.pk is None:
+            tx.accrued_interest = tx_state.accrued_interest
+            tx.principal_balance = tx_state.payoff
+            tx.show_principal_balance = tx_state.principal
+            created.append(tx)
+
+        elif tx.date >= from_date and (tx.accrued_interest, tx.principal_balance, tx.show_principal_balance) != \
+                (tx_state.accrued_interest, tx_state.payoff, tx_state.principal):
+            tx.accrued_interest = tx_state.accrued_interest
+            tx.principal_balance = tx_state.payoff
+            tx.show_principal_balance = tx_state.principal
+            changed.append(tx)
+
+        if position % interval == 0:
+            checkpoints.append(_checkpoint(case, tx_state, total_payments, last_payment_date))
+
+    if created:
+        Transaction.objects.bulk_create(created, batch_size=REPLAY_BATCH_SIZE)
+    if changed:
+        Transaction.objects.bulk_update(changed, LEDGER_FIELDS, batch_size=REPLAY_BATCH_SIZE)
+
+    case.checkpoints.filter(date__gte=from_date).delete()
+    if checkpoints:
+        LedgerCheckpoint.objects.bulk_create(checkpoints)
+
+    final_state = states[-1] if states else state
+    case.payoff_amount = final_state.payoff
+    case.accrued_interest = final_state.accrued_interest
+    case.today_payoff = payoff_as_of(final_state, case.interest_rate, timezone.now().date())
+    case.total_payments = total_payments
+    case.last_payment_date = last_payment_date
+    case.last_transaction_date = final_state.date if (states or checkpoint) else None
+    case.ledger_version += 1
+    case.save(update_fields=[
+        'payoff_amount', 'accrued_interest', 'total_payments', 'last_payment_date', 'last_transaction_date',
+        'today_payoff', 'ledger_version'
+    ])
+    update_portfolio(case.user_id, share_before, portfolio_share(case))
+
+    return rows
+
+
+_timeline_stats = {'hits': 0, 'misses': 0}
+_timeline_stats_lock = threading.Lock()
+
+
+def ledger_timeline(case):
+    """
+    Active transactions of ``case`` in date order, with their stored balances.
+
+    The list is cached under the case's ``ledger_version``, which every write
+    to the ledger bumps, so a cached timeline is never stale and old versions
+    simply expire. Treat the returned transactions as read-only.
+    """
+    cache = caches[settings.LEDGER_TIMELINE_CACHE]
+    key = f'ledger-timeline:{case.id}:{case.ledger_version}'
+
+    timeline = cache.get(key)
+    with _timeline_stats_lock:
+        _timeline_stats['misses' if timeline is None else 'hits'] += 1
+
+    if timeline is None:
+        timeline = list(Transaction.objects.filter(case=case, is_active=True).order_by('date', 'id'))
+        cache.set(key, timeline, settings.LEDGER_TIMELINE_TIMEOUT)
+
+    # Avoid a query per row when templates follow tx.case
+    for tx in timeline:
+        tx.case = case
+    return timeline
+
+
+def timeline_cache_stats():
+    """Hit and miss counts of ledger_timeline() in this process."""
+    with _timeline_stats_lock:
+        hits, misses = _timeline_stats['hits'], _timeline_stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+    }
+
+
+def ledger_state_as_of(case, as_of):
+    """
+    Running balances of ``case`` after its last active transaction on or
+    before ``as_of``.
+
+    Dates on or after the latest transaction are answered from the case row
+    itself; earlier dates need one indexed lookup of the transaction that was
+    current on that day.
+    """
+    if case.last_transaction_date is None or as_of >= case.last_transaction_date:
+        return case.ledger_state()
+
+    tx = Transaction.objects.filter(case=case, is_active=True, date__lte=as_of).order_by('date', 'id').last()
+    if tx:
+        return LedgerState.from_transaction(tx)
+    return LedgerState.opening(case.judgment_amount, case.judgment_date)
+
+
+def payoff_summary(case, as_of):
+    """Payoff figures of ``case`` on ``as_of``, shared by the payoff endpoint and statement."""
+    state = ledger_state_as_of(case, as_of)
+    payoff_amount = payoff_as_of(state, case.interest_rate, as_of)
+
+    return {
+        'case_id': case.id,
+        'date': as_of,
+        'interest_start_date': state.date,
+        'principal': state.principal,
+        'accrued_interest': payoff_amount - state.principal,
+        'daily_interest': daily_interest(state.principal, case.interest_rate),
+        'payoff_amount': payoff_amount,
+    }
+
+
+def record_checkpoint(case, state):
+    """
+    Stores a checkpoint at ``state`` once a full interval of transactions has
+    been appended since the latest one. ``case`` must already carry the totals
+    as of ``state``.
+    """
+    pending = Transaction.objects.filter(case=case, is_active=True)
+    latest = case.checkpoints.first()
+    if latest:
+        pending = pending.filter(date__gt=latest.date)
+
+    if pending.count() >= settings.LEDGER_CHECKPOINT_INTERVAL:
+        _checkpoint(case, state, case.total_payments, case.last_payment_date).save()
+
+
+def _checkpoint(case, state, total_payments, last_payment_date):
+    return LedgerCheckpoint(
+        case=case,
+        date=state.date,
+        principal_balance=state.principal,
+        accrued_interest=state.accrued_interest,
+        total_payments=total_payments,
+        last_payment_date=last_payment_date
+    )
+
+
+PORTFOLIO_FIELDS = ('total_judgments', 'total_collected', 'outstanding_payoff', 'active_cases', 'ended_cases')
+
+NO_SHARE = (ZERO, ZERO, ZERO, 0, 0)
+
+
+def portfolio_share(case):
+    """What ``case`` adds to each of PORTFOLIO_FIELDS in its owner's summary."""
+    if not case.is_active:
+        return NO_SHARE
+    return (
+        Decimal(case.judgment_amount),
+        Decimal(case.total_payments),
+        Decimal(case.payoff_amount),
+        0 if case.is_ended else 1,
+        1 if case.is_ended else 0,
+    )
+
+
+def update_portfolio(user_id, before, after):
+    """
+    Applies the change from share ``before`` to share ``after`` (see
+    portfolio_share) to the user's UserPortfolioSummary. Call it in the same
+    atomic block as the change, once the change is saved.
+    """
+    deltas = {
+        field: F(field) + (new - old)
+        for field, old, new in zip(PORTFOLIO_FIELDS, before, after)
+        if new != old
+    }
+    if not deltas:
+        return
+
+    if not UserPortfolioSummary.objects.filter(user_id=user_id).update(**deltas, updated_at=timezone.now()):
+        # First change since the summary was introduced, build it from the cases
+        rebuild_portfolio(user_id)
+
+
+def rebuild_portfolio(user_id):
+    """Recomputes the user's UserPortfolioSummary from their cases and returns it."""
+    totals = CaseDetails.objects.filter(user_id=user_id, is_active=True).aggregate(
+        total_judgments=Coalesce(Sum('judgment_amount'), ZERO),
+        total_collected=Coalesce(Sum('total_payments'), ZERO),
+        outstanding_payoff=Coalesce(Sum('payoff_amount'), ZERO),
+        active_cases=Count('id', filter=Q(is_ended=False)),
+        ended_cases=Count('id', filter=Q(is_ended=True)),
+    )
+    summary, _ = UserPortfolioSummary.objects.update_or_create(user_id=user_id, defaults=totals)
+    return summary
@@ -1,3 +1,911 @@
-from django.test import TestCase
+import random
+import tempfile
+import threading
+import tracemalloc
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from pypdf import PdfReader
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from authentication.models import User
+from .jobs import enqueue_pdf_job
+from .ledger import LedgerState, apply_custom_rounding, batch_payoffs_as_of, payoff_as_of, replay
+from .ledger_reference import ROUNDING_EDGES, legacy_custom_rounding
+from .management.commands.run_pdf_worker import Command as PDFWorkerCommand
+from .models import CaseDetails, PDFCacheEntry, PDFJob, Transaction, UserPortfolioSummary
+from .pagination import encode_cursor
+from .pdf import case_transactions_context
+from .pdf_cache import get_cached_pdf, pdf_cache_storage, store_pdf
+from .pdf_reportlab import draw_case_transactions
+from .pdf_stream import ledger_rows, stream_case_transactions
+from .services import PORTFOLIO_FIELDS, ledger_timeline, rebuild_portfolio, timeline_cache_stats, update_portfolio
+from .views import ImportCasesView
 
-# Create your tests here.
+
+def create_user(email='lawyer@example.com'):
+    return User.objects.create(email=email, username=email, payment_status='pro')
+
+
+def create_case(user, number='C-1'):
+    return CaseDetails.objects.create(
+        user=user, case_name=f'Case {number}', court_name='County Court', court_case_number=number,
+        judgment_amount=Decimal('10000.00'), interest_rate=Decimal('9.000000'), judgment_date=date(2020, 1, 1),
+        payoff_amount=Decimal('10000.00'),
+    )
+
+
+def add_transactions(case, rows):
+    """Stores ``rows`` daily payments on ``case`` without replaying balances; for tests that only read them."""
+    Transaction.objects.bulk_create([
+        Transaction(
+            case=case, transaction_type='PAYMENT', amount=Decimal('10.00'), date=case.judgment_date + timedelta(days=day),
+            accrued_interest=Decimal('1.25'), principal_balance=Decimal('9000.00'), show_principal_balance=Decimal('9000.00'),
+        )
+        for day in range(1, rows + 1)
+    ], batch_size=2000)
+
+
+def synthetic_ledger_rows(rows):
+    """ledger_rows() tuples made one at a time, like a database iterator."""
+    tx_date = date(2000, 1, 1)
+    for number in range(rows):
+        tx_date += timedelta(days=1)
+        yield (
+            tx_date, 'PAYMENT', Decimal(number).scaleb(-2), Decimal(number).scaleb(-3), Decimal(number * 7).scaleb(-2)
+        )
+
+
+class StreamedTransactionsPDFTests(SimpleTestCase):
+    case = CaseDetails(
+        id=1, case_name='Stream (v) Ledger', court_case_number='S-1',
+        judgment_amount=Decimal('1000.00'), judgment_date=date(2000, 1, 1),
+    )
+
+    def stream_peak(self, rows):
+        """Peak bytes allocated while streaming ``rows`` rows and discarding the output, as a response does."""
+        tracemalloc.start()
+        for chunk in stream_case_transactions(self.case, synthetic_ledger_rows(rows), date(2025, 1, 1)):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    def test_document_is_valid_and_paginated(self):
+        pdf = b''.join(stream_case_transactions(self.case, synthetic_ledger_rows(200), date(2025, 1, 1)))
+        reader = PdfReader(BytesIO(pdf), strict=True)
+
+        # Pages break where the ReportLab layout breaks them
+        transactions = [
+            Transaction(date=tx_date, transaction_type=tx_type, amount=amount, accrued_interest=interest, principal_balance=balance)
+            for tx_date, tx_type, amount, interest, balance in synthetic_ledger_rows(200)
+        ]
+        drawn = draw_case_transactions(case_transactions_context(self.case, transactions, date(2025, 1, 1)))
+        self.assertEqual(len(reader.pages), len(PdfReader(BytesIO(drawn)).pages))
+        self.assertIn('Stream (v) Ledger', reader.pages[0].extract_text())
+        self.assertIn('Generated by JudgmentCalc.com', reader.pages[-1].extract_text())
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        # A first run takes the one-time allocations: font metrics, imports
+        self.stream_peak(100)
+        small = self.stream_peak(1000)
+        large = self.stream_peak(10000)
+        self.assertLess(large, 1024 * 1024)
+        self.assertLess(large, small + 64 * 1024)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=500)
+class ExportTransactionsCSVTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.small = create_case(cls.user, 'SMALL')
+        add_transactions(cls.small, 1000)
+        cls.large = create_case(cls.user, 'LARGE')
+        add_transactions(cls.large, 20000)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, case):
+        """Streams the export of ``case``, returning its line count and the peak bytes allocated meanwhile."""
+        tracemalloc.start()
+        response = self.client.get(f'/docket/api/export/transactions.csv?cases={case.id}')
+        lines = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return lines, peak
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        # A first run takes the one-time allocations
+        self.export(self.small)
+        small_lines, small = self.export(self.small)
+        large_lines, large = self.export(self.large)
+        self.assertEqual((small_lines, large_lines), (1001, 20001))
+        self.assertLess(large, small + 256 * 1024)
+
+
+@override_settings(CASE_IMPORT_CHUNK_SIZE=50)
+class ImportCasesTests(TestCase):
+    def upload(self, user, rows):
+        client = APIClient()
+        client.force_authenticate(user)
+        lines = ['caseName,courtName,courtCaseNumber,judgmentAmount,judgmentDate,totalPayments,accruedInterest,'
+                 'principalBalance,payoffAmount,interestRate']
+        lines += [f'Case {number},County Court,IMP-{number},1000,2020-01-01,0,0,1000,1000,9' for number in range(rows)]
+        upload = SimpleUploadedFile('cases.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        return client.post('/docket/api/cases/import/', {'file': upload}, format='multipart')
+
+    def test_rows_are_saved_in_chunks(self):
+        user = create_user()
+        with mock.patch.object(ImportCasesView, 'save_chunk', autospec=True, side_effect=ImportCasesView.save_chunk) as save_chunk:
+            response = self.upload(user, 120)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['created'], 120)
+        self.assertEqual([len(call.args[1]) for call in save_chunk.call_args_list], [50, 50, 20])
+        self.assertEqual(CaseDetails.objects.filter(user=user).count(), 120)
+
+    def test_rows_rejected_on_save_leave_the_free_plan_quota(self):
+        user = create_user()
+        user.payment_status = 'free'
+        user.save()
+        # IMP-1 belongs to another lawyer, so it is only rejected when its chunk is saved
+        create_case(create_user('other@example.com'), 'IMP-1')
+
+        response = self.upload(user, 6)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['created'], 3)
+        self.assertEqual(
+            sorted(CaseDetails.objects.filter(user=user).values_list('court_case_number', flat=True)), ['IMP-0', 'IMP-2', 'IMP-3']
+        )
+        self.assertEqual([error['row'] for error in response.data['data']['errors']], [3, 6, 7])
+
+
+class ListQueryCountTests(TestCase):
+    """
+    The list endpoints take a fixed number of queries however many rows they
+    return: the JWT user lookup, then the cases, or the case and its timeline.
+    """
+
+    sizes = (5, 60)
+
+    def client_with_ledger(self, size):
+        """A client for a new user holding ``size`` cases, the first with ``size`` transactions; and that case."""
+        user = create_user(f'lawyer{size}@example.com')
+        cases = [create_case(user, f'Q{size}-{number}') for number in range(size)]
+        add_transactions(cases[0], size)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client, cases[0]
+
+    def get(self, client, url, queries):
+        # Every request starts with a cold timeline cache
+        caches[settings.LEDGER_TIMELINE_CACHE].clear()
+        with self.assertNumQueries(queries):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_case_list(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                client, _ = self.client_with_ledger(size)
+                response = self.get(client, '/docket/api/cases/', 2)
+                self.assertEqual(len(response.data['data']), size)
+                self.get(client, '/docket/api/cases/?fields=caseName,payoffAmount', 2)
+
+                page = self.get(client, '/docket/api/cases/?limit=2', 2)
+                self.get(client, f'/docket/api/cases/?limit=2&cursor={page.data["next_cursor"]}', 2)
+                self.get(client, '/docket/api/cases/?limit=2&fields=caseName', 2)
+
+    def test_transaction_list(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                client, case = self.client_with_ledger(size)
+                url = f'/docket/api/cases/{case.id}/transactions/'
+                response = self.get(client, url, 3)
+                self.assertEqual(len(response.data['transactions']), size)
+                self.get(client, f'{url}?fields=date,amount,interestRate', 3)
+
+                page = self.get(client, f'{url}?limit=2', 3)
+                self.get(client, f'{url}?limit=2&cursor={page.data["next_cursor"]}', 3)
+                self.get(client, f'{url}?limit=2&fields=amount,interestRate', 3)
+
+
+class KeysetCursorTests(TestCase):
+    def test_malformed_cursors_are_rejected(self):
+        user = create_user()
+        case = create_case(user)
+        add_transactions(case, 3)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        cursors = ['not a cursor', encode_cursor({'date': 1})] + [
+            encode_cursor(values) for values in (['garbage', 1], ['2020-01-01', 'x'], [None, 1], [[1], 1], ['2020-01-01'])
+        ]
+        for url in ('/docket/api/cases/', f'/docket/api/cases/{case.id}/transactions/'):
+            for cursor in cursors:
+                with self.subTest(url=url, cursor=cursor):
+                    self.assertEqual(client.get(url, {'limit': 2, 'cursor': cursor}).status_code, 400)
+
+        page = client.get(f'/docket/api/cases/{case.id}/transactions/', {'limit': 2})
+        rest = client.get(f'/docket/api/cases/{case.id}/transactions/', {'limit': 2, 'cursor': page.data['next_cursor']})
+        self.assertEqual(rest.status_code, 200)
+        self.assertEqual(len(rest.data['transactions']), 1)
+
+
+class ReplayQueryCountTests(TestCase):
+    def edit_queries(self, size):
+        """Queries taken by editing the first transaction of a ``size`` row ledger, which replays every later row."""
+        user = create_user(f'lawyer{size}@example.com')
+        case = create_case(user, f'R{size}')
+        add_transactions(case, size)
+        first = case.transactions.order_by('date').first()
+
+        client = APIClient()
+        client.force_authenticate(user)
+        # The first edit also creates the user's portfolio summary
+        client.put(f'/docket/api/transactions/{first.id}/update/', {'amount': '25.00'}, format='json')
+
+        last = case.transactions.order_by('date').last()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.put(f'/docket/api/transactions/{first.id}/update/', {'amount': '30.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # The larger payment lowered every later balance, down to the last row
+        self.assertLess(case.transactions.get(id=last.id).principal_balance, last.principal_balance)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_replayed_suffix(self):
+        # Both ledgers fit one bulk_update batch and hold one checkpoint; on
+        # longer ones only the batches the backend splits the update into add up
+        self.assertEqual(self.edit_queries(55), self.edit_queries(95))
+
+
+class CustomRoundingTests(SimpleTestCase):
+    def assertMatchesLegacy(self, values):
+        mismatches = [
+            (value, apply_custom_rounding(value), legacy_custom_rounding(value))
+            for value in values if apply_custom_rounding(value) != legacy_custom_rounding(value)
+        ]
+        self.assertEqual(mismatches, [])
+
+    def test_threshold_values(self):
+        wholes = [Decimal(whole) for whole in ('0', '0.01', '1.23', '1000.99', '9999999999.99')]
+        self.assertMatchesLegacy([
+            sign * (whole + edge) for whole in wholes for edge in ROUNDING_EDGES for sign in (1, -1)
+        ])
+
+    def test_every_fraction_of_a_cent_at_seven_places(self):
+        self.assertMatchesLegacy([Decimal('12.34') + Decimal(step).scaleb(-7) for step in range(100000)])
+
+    def test_random_values(self):
+        rng = random.Random(0)
+        values = []
+        for _ in range(100000):
+            if rng.random() < 0.5:
+                values.append(Decimal(rng.randint(-10 ** 18, 10 ** 18)).scaleb(-rng.randint(0, 12)))
+            else:
+                values.append(Decimal(rng.randint(-10 ** 10, 10 ** 10)).scaleb(-2) + rng.choice(ROUNDING_EDGES))
+        self.assertMatchesLegacy(values)
+
+
+class BatchPayoffTests(SimpleTestCase):
+    def test_matches_payoff_as_of(self):
+        rng = random.Random(0)
+        as_of = date(2025, 6, 30)
+        states = [
+            (
+                Decimal(rng.randint(0, 10 ** 15)).scaleb(-10),
+                Decimal(rng.randint(0, 10 ** 12)).scaleb(-10),
+                Decimal(rng.randint(0, 25 * 10 ** 6)).scaleb(-6),
+                as_of - timedelta(days=rng.randint(0, 7300)),
+            )
+            for _ in range(50000)
+        ]
+        # Nothing to accrue: no principal, no rate, or no days
+        states += [
+            (Decimal('0'), Decimal('12.50'), Decimal('9.000000'), date(2020, 1, 1)),
+            (Decimal('1000.00'), Decimal('0'), Decimal('0'), date(2020, 1, 1)),
+            (Decimal('1000.00'), Decimal('3.33'), Decimal('9.000000'), as_of),
+        ]
+
+        expected = [
+            payoff_as_of(LedgerState(since, principal, accrued_interest), interest_rate, as_of)
+            for principal, accrued_interest, interest_rate, since in states
+        ]
+        payoffs = batch_payoffs_as_of(states, as_of)
+        self.assertEqual(
+            [(state, a, b) for state, a, b in zip(states, expected, payoffs) if a != b], []
+        )
+
+
+class LedgerIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.case = create_case(cls.user)
+        add_transactions(cls.case, 200)
+        for number in range(20):
+            create_case(cls.user, f'I-{number}')
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Test tables are tiny, make the planner show which index it can use
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_ledger_queries_use_the_one_per_day_index(self):
+        since = self.case.judgment_date + timedelta(days=50)
+        active = Transaction.objects.filter(case=self.case, is_active=True)
+        for queryset in (
+            active.filter(date__gte=since).order_by('date', 'id'),
+            active.filter(date__lt=since).order_by('date').reverse()[:1],
+            ledger_rows(self.case, since),
+        ):
+            with self.subTest(query=str(queryset.query)):
+                self.assertIn('transaction_one_per_day', self.plan(queryset))
+
+    def test_case_list_uses_the_active_cases_index(self):
+        queryset = CaseDetails.objects.filter(user=self.user, is_active=True).order_by('-created_at', '-id')
+        self.assertIn('case_user_active_created', self.plan(queryset))
+
+    def test_one_active_transaction_per_day(self):
+        taken = self.case.transactions.first()
+        duplicate = Transaction(case=self.case, transaction_type='COST', amount=Decimal('5.00'), date=taken.date)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicate.save()
+
+        # A deleted transaction no longer holds its day
+        Transaction.objects.filter(id=taken.id).update(is_active=False)
+        duplicate.save()
+
+
+class LedgerReplayAssertions:
+    def assertLedgerMatchesFullReplay(self, case, kept=0):
+        """
+        The stored balances of ``case`` equal a replay of its active transactions
+        from the judgment, or from the stored balances of its first ``kept`` rows.
+        """
+        case.refresh_from_db()
+        rows = list(case.transactions.filter(is_active=True).order_by('date', 'id'))
+        start = LedgerState.from_transaction(rows[kept - 1]) if kept else LedgerState.opening(case.judgment_amount, case.judgment_date)
+        states = replay(start, case.interest_rate, rows[kept:])
+
+        self.assertEqual(
+            [(tx.date, tx.accrued_interest, tx.principal_balance, tx.show_principal_balance) for tx in rows[kept:]],
+            [(tx.date, state.accrued_interest, state.payoff, state.principal) for tx, state in zip(rows[kept:], states)],
+        )
+        final = states[-1] if states else start
+        self.assertEqual(case.payoff_amount, final.payoff)
+        self.assertEqual(case.total_payments, sum((tx.amount for tx in rows if tx.transaction_type == 'PAYMENT'), Decimal('0.00')))
+
+
+class InterleavedLedgerWriteTests(LedgerReplayAssertions, TestCase):
+    """
+    Each test runs a second write at the moment the first one asks for the
+    case lock, as a concurrent request that committed just before it would.
+    """
+
+    def setUp(self):
+        self.user = create_user()
+        self.case = create_case(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.transactions = [self.create(day) for day in (10, 20, 30, 40)]
+
+    def create(self, day, amount='100.00'):
+        response = self.client.post('/docket/api/transactions/create/', {
+            'case_id': self.case.id, 'transaction_type': 'PAYMENT', 'amount': amount,
+            'date': (self.case.judgment_date + timedelta(days=day)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return self.case.transactions.get(date=self.case.judgment_date + timedelta(days=day), is_active=True)
+
+    def update(self, tx, **data):
+        return self.client.put(f'/docket/api/transactions/{tx.id}/update/', data, format='json')
+
+    def delete(self, tx):
+        return self.client.delete(f'/docket/api/transactions/{tx.id}/delete/')
+
+    def interleave(self, write):
+        """Runs ``write`` when the next request reaches select_for_update() on the case."""
+        select_for_update = CaseDetails.objects.select_for_update
+        pending = [write]
+
+        def locked(*args, **kwargs):
+            if pending:
+                pending.pop()()
+            return select_for_update(*args, **kwargs)
+        return mock.patch.object(CaseDetails.objects, 'select_for_update', side_effect=locked)
+
+    def test_delete_after_the_transaction_moved_earlier(self):
+        last = self.transactions[-1]
+        moved = (self.case.judgment_date + timedelta(days=15)).isoformat()
+        with self.interleave(lambda: self.assertEqual(self.update(last, date=moved).status_code, 200)):
+            self.assertEqual(self.delete(last).status_code, 200)
+        self.assertLedgerMatchesFullReplay(self.case)
+
+    def test_same_transaction_deleted_twice(self):
+        first = self.transactions[0]
+        with self.interleave(lambda: self.assertEqual(self.delete(first).status_code, 200)):
+            self.assertEqual(self.delete(first).status_code, 404)
+        self.assertLedgerMatchesFullReplay(self.case)
+
+    def test_create_after_a_back_dated_create(self):
+        with self.interleave(lambda: self.create(5)):
+            self.create(50)
+        self.assertEqual(self.case.transactions.filter(is_active=True).count(), 6)
+        self.assertLedgerMatchesFullReplay(self.case)
+
+    def test_update_of_a_deleted_transaction(self):
+        deleted = self.transactions[1]
+        self.assertEqual(self.delete(deleted).status_code, 200)
+        self.assertEqual(self.update(deleted, amount='250.00').status_code, 404)
+
+        # And of one deleted while the update waited for the lock
+        with self.interleave(lambda: self.assertEqual(self.delete(self.transactions[2]).status_code, 200)):
+            self.assertEqual(self.update(self.transactions[2], amount='250.00').status_code, 404)
+        self.assertEqual(Transaction.objects.get(id=self.transactions[2].id).amount, Decimal('100.00'))
+        self.assertLedgerMatchesFullReplay(self.case)
+
+    def test_update_after_an_earlier_delete(self):
+        with self.interleave(lambda: self.assertEqual(self.delete(self.transactions[0]).status_code, 200)):
+            self.assertEqual(self.update(self.transactions[2], amount='250.00').status_code, 200)
+        self.assertLedgerMatchesFullReplay(self.case)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentLedgerWriteTests(LedgerReplayAssertions, TransactionTestCase):
+    """
+    Hundreds of creates, updates and deletes on one case from several threads.
+    Needs a database with row locks; SQLite serializes whole transactions
+    instead and fails concurrent writers with "database is locked".
+    """
+
+    threads = 8
+
+    def test_stress(self):
+        user = create_user()
+        case = create_case(user)
+        client = APIClient()
+        client.force_authenticate(user)
+        for day in range(1, 101, 2):
+            client.post('/docket/api/transactions/create/', {
+                'case_id': case.id, 'transaction_type': 'PAYMENT', 'amount': '50.00',
+                'date': (case.judgment_date + timedelta(days=day)).isoformat(),
+            }, format='json')
+        seeded = list(case.transactions.order_by('date'))
+
+        # Back-dated creates between the seeded days, edits and deletes of
+        # seeded rows, each seeded row deleted twice
+        operations = [('create', day) for day in range(2, 302, 2)]
+        operations += [('update', tx) for tx in seeded[::2]]
+        operations += [('delete', tx) for tx in seeded[1::4]] * 2
+        random.Random(0).shuffle(operations)
+
+        statuses = []
+
+        def worker(batch):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                for action, target in batch:
+                    if action == 'create':
+                        response = client.post('/docket/api/transactions/create/', {
+                            'case_id': case.id, 'transaction_type': 'PAYMENT', 'amount': '25.00',
+                            'date': (case.judgment_date + timedelta(days=target)).isoformat(),
+                        }, format='json')
+                    elif action == 'update':
+                        response = client.put(f'/docket/api/transactions/{target.id}/update/', {'amount': '75.00'}, format='json')
+                    else:
+                        response = client.delete(f'/docket/api/transactions/{target.id}/delete/')
+                    statuses.append((action, response.status_code))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(operations[start::self.threads],)) for start in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(len(statuses), len(operations))
+        self.assertTrue(all(code in (200, 201) for action, code in statuses if action != 'delete'), statuses)
+        # Of the two deletes of a row exactly one succeeds
+        self.assertEqual(statuses.count(('delete', 200)), len(seeded[1::4]))
+        self.assertEqual(statuses.count(('delete', 404)), len(seeded[1::4]))
+        self.assertEqual(case.transactions.filter(is_active=True).count(), len(seeded) + 150 - len(seeded[1::4]))
+        self.assertLedgerMatchesFullReplay(case)
+
+
+def add_case_with_history(client, number='O-1'):
+    """A case added through the API with 4000.00 already paid, recorded as its opening transaction."""
+    response = client.post('/docket/api/add-docket/', {
+        'caseName': f'Opening (v) Row {number}', 'courtName': 'County Court', 'courtCaseNumber': number,
+        'judgmentAmount': '10000.00', 'judgmentDate': '2020-01-01', 'interestRate': '9.000000',
+        'lastPaymentDate': '2021-01-01', 'totalPayments': '4000.00', 'accruedInterest': '0.00',
+        'principalBalance': '6000.00', 'payoffAmount': '6000.00',
+    }, format='json')
+    assert response.status_code == 201, response.data
+    return CaseDetails.objects.get(id=response.data['data']['case_id'])
+
+
+class OpeningRowReplayTests(LedgerReplayAssertions, TestCase):
+    """Replays on a case added with its payment history start from the entered balances, not the judgment."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user())
+        self.case = add_case_with_history(self.client)
+        self.payments = [self.create(tx_date) for tx_date in ('2021-03-01', '2021-06-01', '2021-09-01')]
+
+    def create(self, tx_date, amount='100.00'):
+        response = self.client.post('/docket/api/transactions/create/', {
+            'case_id': self.case.id, 'transaction_type': 'PAYMENT', 'amount': amount, 'date': tx_date,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['data']['transaction_id']
+
+    def assertPayoffNearEnteredBalance(self):
+        self.case.refresh_from_db()
+        self.assertLess(self.case.payoff_amount, Decimal('7000.00'))
+
+    def test_delete(self):
+        response = self.client.delete(f'/docket/api/transactions/{self.payments[1]}/delete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertPayoffNearEnteredBalance()
+        self.assertLedgerMatchesFullReplay(self.case, kept=1)
+        self.assertEqual(self.case.total_payments, Decimal('4200.00'))
+
+    def test_edit(self):
+        response = self.client.put(f'/docket/api/transactions/{self.payments[0]}/update/', {'amount': '300.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertPayoffNearEnteredBalance()
+        self.assertLedgerMatchesFullReplay(self.case, kept=1)
+
+    def test_back_dated_create(self):
+        self.create('2021-02-01')
+        self.assertPayoffNearEnteredBalance()
+        self.assertLedgerMatchesFullReplay(self.case, kept=1)
+        self.assertEqual(self.case.total_payments, Decimal('4400.00'))
+
+
+class TemporaryPDFCache:
+    """Points the PDF cache at a directory removed after each test."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.use_storage(directory.name)
+
+    def use_storage(self, location):
+        storage = override_settings(PDF_CACHE_STORAGE={
+            'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': location},
+        })
+        storage.enable()
+        self.addCleanup(storage.disable)
+        pdf_cache_storage.cache_clear()
+        self.addCleanup(pdf_cache_storage.cache_clear)
+
+
+class PDFCacheTests(TemporaryPDFCache, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.case = create_case(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, **headers):
+        return self.client.get(f'/docket/api/transactions/{self.case.id}/download/?renderer=reportlab', headers=headers)
+
+    def test_hits_skip_rendering_and_matching_etags_get_304(self):
+        first = self.download()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(PDFCacheEntry.objects.count(), 1)
+
+        with mock.patch('docket.pdf_cache.render_document') as render:
+            cached = self.download()
+            not_modified = self.download(if_none_match=first['ETag'])
+        render.assert_not_called()
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        # A new transaction changes the document and its ETag
+        self.client.post('/docket/api/transactions/create/', {
+            'case_id': self.case.id, 'transaction_type': 'PAYMENT', 'amount': '100.00', 'date': '2020-02-01',
+        }, format='json')
+        self.assertEqual(self.download(if_none_match=first['ETag']).status_code, 200)
+
+    def test_unwritable_storage_still_serves_the_document(self):
+        # A directory under a regular file can't be created, even by root
+        blocker = tempfile.NamedTemporaryFile()
+        self.addCleanup(blocker.close)
+        self.use_storage(f'{blocker.name}/pdf_cache')
+
+        with self.assertLogs('docket.pdf_cache', 'ERROR'):
+            response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertFalse(PDFCacheEntry.objects.exists())
+
+    @override_settings(PDF_CACHE_MAX_BYTES=3000)
+    def test_least_recently_used_are_evicted_first(self):
+        for key in ('a' * 64, 'b' * 64, 'c' * 64):
+            store_pdf(key, b'%PDF' + b'x' * 996)
+        # Reading a document makes it the most recently used
+        self.assertIsNotNone(get_cached_pdf('a' * 64))
+
+        store_pdf('d' * 64, b'%PDF' + b'x' * 996)
+        self.assertEqual(set(PDFCacheEntry.objects.values_list('key', flat=True)), {'a' * 64, 'c' * 64, 'd' * 64})
+        self.assertFalse(pdf_cache_storage().exists(f'bb/{"b" * 64}.pdf'))
+        self.assertIsNone(get_cached_pdf('b' * 64))
+
+
+class InlinePool:
+    """
+    Stands in for the PDF worker's process pool, running each job in the test's
+    own process. ``failures`` maps job ids to the exceptions their next runs
+    end with instead, one per run.
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def submit(self, fn, job_id):
+        future = Future()
+        if self.failures.get(job_id):
+            future.set_exception(self.failures[job_id].pop(0))
+        else:
+            future.set_result(fn(job_id))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class PDFWorkerTests(TemporaryPDFCache, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = create_user()
+        case = create_case(user)
+        self.jobs = [enqueue_pdf_job(user, case, 'case_transactions', renderer='reportlab').id for _ in range(3)]
+
+    def run_worker(self, failures):
+        pools = []
+
+        def create_pool(processes):
+            pools.append(InlinePool(failures))
+            return pools[-1]
+
+        with mock.patch.object(PDFWorkerCommand, 'create_pool', side_effect=create_pool):
+            call_command('run_pdf_worker', once=True, processes=3, stdout=StringIO(), stderr=StringIO())
+        return pools
+
+    def assertJobs(self, **statuses):
+        jobs = {job.id: job for job in PDFJob.objects.filter(id__in=self.jobs)}
+        for job_id, expected in zip(self.jobs, ('first', 'second', 'third')):
+            self.assertEqual(jobs[job_id].status, statuses.get(expected, PDFJob.DONE))
+            self.assertIsNotNone(jobs[job_id].finished_at)
+        return jobs
+
+    def test_jobs_run_to_done(self):
+        self.run_worker({})
+        jobs = self.assertJobs()
+        self.assertTrue(bytes(jobs[self.jobs[0]].pdf).startswith(b'%PDF'))
+
+    def test_job_lost_with_a_crashed_pool_is_requeued(self):
+        pools = self.run_worker({self.jobs[1]: [BrokenProcessPool()]})
+        self.assertEqual(len(pools), 2)
+        self.assertJobs()
+
+    def test_job_lost_with_two_pools_fails(self):
+        self.run_worker({self.jobs[1]: [BrokenProcessPool(), BrokenProcessPool()]})
+        jobs = self.assertJobs(second=PDFJob.FAILED)
+        self.assertEqual(jobs[self.jobs[1]].error, 'The render process crashed.')
+
+    def test_job_error_outside_the_job_fails_it(self):
+        self.run_worker({self.jobs[2]: [RuntimeError('Unpickling failed')]})
+        jobs = self.assertJobs(third=PDFJob.FAILED)
+        self.assertEqual(jobs[self.jobs[2]].error, 'Unpickling failed')
+
+
+class PortfolioSummaryTests(TestCase):
+    """The incrementally maintained summary always equals one rebuilt from the cases."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertMatchesRebuild(self):
+        incremental = UserPortfolioSummary.objects.filter(user=self.user).values_list(*PORTFOLIO_FIELDS).get()
+        rebuild_portfolio(self.user.id)
+        rebuilt = UserPortfolioSummary.objects.filter(user=self.user).values_list(*PORTFOLIO_FIELDS).get()
+        self.assertEqual(incremental, rebuilt)
+
+    def add_case(self, number, judgment_amount):
+        response = self.client.post('/docket/api/add-docket/', {
+            'caseName': f'Portfolio {number}', 'courtName': 'County Court', 'courtCaseNumber': number,
+            'judgmentAmount': judgment_amount, 'judgmentDate': '2020-01-01', 'interestRate': 9,
+            'totalPayments': 0, 'accruedInterest': 0, 'principalBalance': judgment_amount, 'payoffAmount': judgment_amount,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertMatchesRebuild()
+        return response.data['data']['case_id']
+
+    def test_incremental_updates_match_rebuild(self):
+        # Amounts are JSON numbers, so they arrive as floats
+        case_id = self.add_case('P-1', 1000.1)
+        other_id = self.add_case('P-2', 2500.35)
+
+        with mock.patch('docket.views.update_portfolio', wraps=update_portfolio) as update:
+            response = self.client.put(f'/docket/api/case/{case_id}/edit/', {
+                'caseName': 'Portfolio P-1', 'courtName': 'County Court', 'courtCaseNumber': 'P-1',
+                'judgmentAmount': 1234.57, 'judgmentDate': '2020-01-01',
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        # The delta is exact, not the binary expansion of the float
+        _, before, after = update.call_args.args
+        self.assertEqual(after[0] - before[0], Decimal('234.47'))
+        self.assertMatchesRebuild()
+
+        response = self.client.post('/docket/api/transactions/create/', {
+            'case_id': other_id, 'transaction_type': 'PAYMENT', 'amount': 100.1, 'date': '2020-03-01',
+        }, format='json')
+        self.assertMatchesRebuild()
+        transaction_id = response.data['data']['transaction_id']
+
+        self.client.put(f'/docket/api/transactions/{transaction_id}/update/', {'amount': 200.3}, format='json')
+        self.assertMatchesRebuild()
+        self.client.delete(f'/docket/api/transactions/{transaction_id}/delete/')
+        self.assertMatchesRebuild()
+        self.client.delete(f'/docket/api/cases/{case_id}/delete/')
+        self.assertMatchesRebuild()
+
+        self.assertEqual(UserPortfolioSummary.objects.get(user=self.user).total_judgments, Decimal('2500.35'))
+
+
+class BulkImportTests(LedgerReplayAssertions, TestCase):
+    """A bulk import stores the same balances as adding its rows one at a time."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user())
+        rng = random.Random(9)
+        days = sorted(rng.sample(range(1, 700), 40))
+        self.rows = [
+            {
+                'transaction_type': rng.choice(['PAYMENT', 'PAYMENT', 'COST']),
+                'amount': str(Decimal(rng.randint(100, 30000)).scaleb(-2)),
+                'date': (date(2021, 1, 1) + timedelta(days=day)).isoformat(),
+            }
+            for day in days
+        ]
+
+    def ledger(self, case):
+        case.refresh_from_db()
+        return (
+            list(case.transactions.filter(is_active=True).order_by('date').values_list(
+                'date', 'transaction_type', 'amount', 'accrued_interest', 'principal_balance', 'show_principal_balance',
+            )),
+            case.payoff_amount, case.accrued_interest, case.total_payments, case.last_payment_date, case.last_transaction_date,
+        )
+
+    def one_at_a_time(self, case, rows):
+        for row in rows:
+            response = self.client.post('/docket/api/transactions/create/', {'case_id': case.id, **row}, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+
+    def bulk(self, case, rows):
+        response = self.client.post(f'/docket/api/cases/{case.id}/transactions/bulk/', {'transactions': rows}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_matches_one_at_a_time(self):
+        bulk_case = add_case_with_history(self.client, 'B-1')
+        single_case = add_case_with_history(self.client, 'B-2')
+        self.bulk(bulk_case, self.rows)
+        self.one_at_a_time(single_case, self.rows)
+
+        self.assertEqual(self.ledger(bulk_case), self.ledger(single_case))
+        self.assertLedgerMatchesFullReplay(bulk_case, kept=1)
+
+    def test_back_dated_import_matches_one_at_a_time(self):
+        # Every other row is already on the ledger, the import fills in the rest
+        bulk_case = add_case_with_history(self.client, 'B-1')
+        single_case = add_case_with_history(self.client, 'B-2')
+        self.one_at_a_time(bulk_case, self.rows[1::2])
+        self.bulk(bulk_case, self.rows[::2])
+        self.one_at_a_time(single_case, self.rows)
+
+        self.assertEqual(self.ledger(bulk_case), self.ledger(single_case))
+        self.assertLedgerMatchesFullReplay(bulk_case, kept=1)
+
+
+class PayoffAndTimelineTests(TestCase):
+    def setUp(self):
+        user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.case = create_case(user)
+        self.rows = [('PAYMENT', '500.00', date(2020, 3, 1)), ('COST', '75.25', date(2020, 6, 15)), ('PAYMENT', '1200.00', date(2021, 1, 10))]
+        self.ids = [self.create(*row) for row in self.rows]
+        caches[settings.LEDGER_TIMELINE_CACHE].clear()
+
+    def create(self, transaction_type, amount, tx_date):
+        response = self.client.post('/docket/api/transactions/create/', {
+            'case_id': self.case.id, 'transaction_type': transaction_type, 'amount': amount, 'date': tx_date.isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['data']['transaction_id']
+
+    def timeline(self):
+        self.case.refresh_from_db()
+        return [(tx.id, tx.amount, tx.principal_balance) for tx in ledger_timeline(self.case)]
+
+    def test_payoff_matches_payoff_as_of(self):
+        opening = LedgerState.opening(self.case.judgment_amount, self.case.judgment_date)
+        states = replay(opening, self.case.interest_rate, [
+            Transaction(transaction_type=transaction_type, amount=Decimal(amount), date=tx_date)
+            for transaction_type, amount, tx_date in self.rows
+        ])
+
+        for as_of in (date(2020, 1, 1), date(2020, 2, 1), date(2020, 3, 1), date(2020, 9, 30), date(2021, 1, 10), date(2024, 5, 5)):
+            with self.subTest(as_of=as_of):
+                state = next((state for state in reversed(states) if state.date <= as_of), opening)
+                response = self.client.get(f'/docket/api/cases/{self.case.id}/payoff/', {'date': as_of.isoformat()})
+                self.assertEqual(response.status_code, 200)
+                data = response.data['data']
+                self.assertEqual(Decimal(data['payoffAmount']), payoff_as_of(state, self.case.interest_rate, as_of))
+                self.assertEqual(Decimal(data['principalBalance']), state.principal)
+                self.assertEqual(data['interestStartDate'], state.date.isoformat())
+
+        self.assertEqual(self.client.get(f'/docket/api/cases/{self.case.id}/payoff/', {'date': '2021-13-01'}).status_code, 400)
+
+    def test_timeline_is_cached_per_ledger_version(self):
+        first = self.timeline()
+        hits = timeline_cache_stats()['hits']
+        with self.assertNumQueries(0):
+            self.assertEqual([(tx.id, tx.amount, tx.principal_balance) for tx in ledger_timeline(self.case)], first)
+        self.assertEqual(timeline_cache_stats()['hits'], hits + 1)
+
+    def listed(self):
+        return [tx['id'] for tx in self.client.get(f'/docket/api/cases/{self.case.id}/transactions/').data['transactions']]
+
+    def test_timeline_cache_invalidates_after_each_write(self):
+        self.assertEqual(self.listed(), self.ids[::-1])
+
+        # Create: a back-dated row changes the balances after it too
+        before = self.timeline()
+        new_id = self.create('PAYMENT', '10.00', date(2020, 2, 1))
+        after = self.timeline()
+        self.assertEqual([row[0] for row in after], [new_id, *self.ids])
+        self.assertNotEqual(after[1:], before)
+        self.assertEqual(self.listed(), [*self.ids[::-1], new_id])
+
+        # Update
+        self.client.put(f'/docket/api/transactions/{self.ids[0]}/update/', {'amount': '600.00'}, format='json')
+        self.assertEqual(self.timeline()[1][1], Decimal('600.00'))
+
+        # Delete
+        self.client.delete(f'/docket/api/transactions/{new_id}/delete/')
+        self.assertEqual([row[0] for row in self.timeline()], self.ids)
+        self.assertEqual(self.listed(), self.ids[::-1])
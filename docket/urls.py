@@ -3,14 +3,25 @@ from .views import *
 
 urlpatterns = [
     path('add-docket/', AddCaseView.as_view(), name='add_docket'),
+    path('cases/import/', ImportCasesView.as_view(), name='import_cases'),
     path('cases/', CaseListView.as_view(), name='case_list'),
     path('cases/<int:case_id>/', CaseDetailView.as_view(), name='case-detail'),
+    path('cases/<int:case_id>/payoff/', CasePayoffView.as_view(), name='case-payoff'),
+    path('cases/<int:case_id>/transactions/bulk/', BulkCreateTransactionsView.as_view(), name='bulk_create_transactions'),
     path('transactions/create/', CreateTransactionView.as_view(), name='create_transaction'),
     path('case/<int:case_id>/edit/', EditCaseView.as_view(), name='edit-case'),
     path('cases/<int:case_id>/transactions/', TransactionListByCaseView.as_view(), name='transactions_by_case'),
     path('transactions/<int:transaction_id>/update/', UpdateTransactionView.as_view(), name='update-transaction'),
     path('cases/<int:case_id>/payoff-statement/', GeneratePayoffPDFView.as_view(), name='generate-payoff-pdf'),
+    path('portfolio/', PortfolioSummaryView.as_view(), name='portfolio-summary'),
     path('cases/<int:case_id>/delete/', DeleteCaseView.as_view(), name='delete-case'),
     path('transactions/<int:transaction_id>/delete/', DeleteTransactionView.as_view(), name='delete-transaction'),
     path('transactions/<int:case_id>/download/', DownloadCaseTransactionsPDF.as_view(), name='download-transaction'),
+    path('pdf-jobs/<int:job_id>/', PDFJobDetailView.as_view(), name='pdf-job-detail'),
+    path('pdf-jobs/<int:job_id>/download/', PDFJobDownloadView.as_view(), name='pdf-job-download'),
+    path('statements/batch/', StatementBatchView.as_view(), name='statement-batch'),
+    path('statements/batch/<int:batch_id>/', StatementBatchDetailView.as_view(), name='statement-batch-detail'),
+    path('statements/batch/<int:batch_id>/download/', StatementBatchDownloadView.as_view(), name='statement-batch-download'),
+    path('export/transactions.csv', ExportTransactionsCSVView.as_view(), name='export-transactions-csv'),
+    path('timeline-cache/stats/', TimelineCacheStatsView.as_view(), name='timeline-cache-stats'),
 ]
\ No newline at end of file
@@ -1,25 +1,80 @@
+import csv
 import logging
+from collections import Counter
+from io import TextIOWrapper
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from django.db import transaction
-from .models import CaseDetails, Transaction
-from decimal import ROUND_HALF_UP, Decimal, getcontext
+from django.db import IntegrityError, transaction
+from .models import CaseDetails, PDFJob, StatementBatch, Transaction, UserPortfolioSummary
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
 from django.utils import timezone
 from rest_framework.generics import ListAPIView
-from .serializers import CaseCreateSerializer, CaseListSerializer, TransactionCreateSerializer, TransactionDetailSerializer, TransactionUpdateSerializer, CaseDetailSerializer
+from .serializers import CASE_LIST_COLUMNS, TRANSACTION_LIST_COLUMNS, case_list_data, transaction_list_data
+from .serializers import BulkTransactionSerializer, CaseCreateSerializer, CaseListSerializer, TransactionCreateSerializer, TransactionDetailSerializer, TransactionUpdateSerializer, CaseDetailSerializer, PayoffSerializer, PortfolioSummarySerializer, PDFJobSerializer
+from .serializers import StatementBatchCreateSerializer, StatementBatchSerializer
 from django.db import transaction as db_transaction
-from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 # from weasyprint import HTML
 from .models import CaseDetails
 from django.utils.timezone import now
 from django.shortcuts import get_object_or_404
-from xhtml2pdf import pisa
-from io import BytesIO
-from django.template.loader import get_template
 from datetime import date, datetime
 from decimal import Decimal, ROUND_DOWN
+from .ledger import LedgerError, LedgerState, apply_transaction, payoff_as_of
+from .jobs import enqueue_pdf_job, enqueue_statement_batch, with_progress
+from .pagination import keyset_page, page_params
+from .pdf import CASE_TRANSACTIONS, PAYOFF_STATEMENT, PDFRenderError, document_date, document_filename
+from .pdf import merge_pdfs, pdf_renderer, render_document, zip_stream
+from .pdf_cache import document_key, get_cached_pdf, render_cached, store_pdf
+from .pdf_stream import ledger_rows, stream_case_transactions
+from .renderers import ORJSONRenderer
+from rest_framework.renderers import BrowsableAPIRenderer
+from operator import attrgetter
+from .services import NO_SHARE, ledger_timeline, payoff_summary, portfolio_share, rebuild_portfolio, update_portfolio
+from .services import record_checkpoint, replay_ledger, timeline_cache_stats
+from authentication.permissions import IsAdmin
+
+
+def build_case(user, data):
+    """
+    Unsaved case for validated CaseCreateSerializer ``data``, together with the
+    PAYMENT transaction recording payments made before it was added (or None).
+    """
+    case = CaseDetails(
+        user=user,
+        case_name=data['caseName'],
+        court_name=data['courtName'],
+        court_case_number=data['courtCaseNumber'],
+        judgment_amount=data['judgmentAmount'],
+        interest_rate=data['interestRate'],
+        judgment_date=data['judgmentDate'],
+        total_payments=data['totalPayments'],
+        accrued_interest=data['accruedInterest'],
+        payoff_amount=data['payoffAmount'],
+        today_payoff=data['payoffAmount'],
+        debtor_info=data.get('debtorInfo', ''),
+        last_payment_date=data.get('lastPaymentDate'),
+        is_ended=data.get('isEnded', False)
+    )
+
+    initial_tx = None
+    if data['totalPayments'] > 0:
+        initial_tx = Transaction(
+            case=case,
+            transaction_type='PAYMENT',
+            amount=data['totalPayments'],
+            principal_balance=data['principalBalance'],
+            show_principal_balance=data['principalBalance'],
+            accrued_interest=data['accruedInterest'],
+            date=data.get('lastPaymentDate') or timezone.now().date()
+        )
+        case.last_transaction_date = initial_tx.date
+
+    return case, initial_tx
 
 
 class AddCaseView(APIView):
@@ -52,33 +107,15 @@ class AddCaseView(APIView):
 
             try:
                 with transaction.atomic():
-                    case = CaseDetails.objects.create(
-                        user=user,
-                        case_name=data['caseName'],
-                        court_name=data['courtName'],
-                        court_case_number=data['courtCaseNumber'],
-                        judgment_amount=data['judgmentAmount'],
-                        interest_rate=data['interestRate'],
-                        judgment_date=data['judgmentDate'],
-                        total_payments=data['totalPayments'],
-                        accrued_interest=data['accruedInterest'],
-                        payoff_amount=data['payoffAmount'],
-                        today_payoff=data['payoffAmount'],
-                        debtor_info=data.get('debtorInfo', ''),
-                        last_payment_date=data.get('lastPaymentDate'),
-                        is_ended=data.get('isEnded', False)
-                    )
+                    case, initial_tx = build_case(user, data)
+                    case.save()
 
                     # Add initial transactions if relevant
-                    if data['totalPayments'] > 0:
-                        Transaction.objects.create(
-                            case=case,
-                            transaction_type='PAYMENT',
-                            amount=data['totalPayments'],
-                            principal_balance=data['principalBalance'],
-                            accrued_interest=data['accruedInterest'],
-                            date=data.get('lastPaymentDate') or timezone.now()
-                        )
+                    if initial_tx:
+                        initial_tx.case = case
+                        initial_tx.save()
+
+                    update_portfolio(user.id, NO_SHARE, portfolio_share(case))
 
                     return Response({
                         'status_code': 201,
@@ -107,6 +144,127 @@ class AddCaseView(APIView):
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+class ImportCasesView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({
+                'status_code': 400,
+                'message': 'Upload a CSV file in the "file" field.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        chunk_size = settings.CASE_IMPORT_CHUNK_SIZE
+
+        # Court case numbers are unique across all cases, including deleted ones
+        taken_numbers = set(CaseDetails.objects.filter(user=user).values_list('court_case_number', flat=True))
+
+        remaining = None
+        if user.payment_status == 'free':
+            remaining = max(3 - CaseDetails.objects.filter(user=user, is_active=True).count(), 0)
+
+        errors = []
+        created = 0
+        chunk = []
+
+        # Rows are parsed and validated one at a time and saved in chunks
+        try:
+            reader = csv.DictReader(TextIOWrapper(upload, encoding='utf-8-sig'))
+            for row in reader:
+                serializer = CaseCreateSerializer(data={
+                    key: value for key, value in row.items() if key is not None and value not in (None, '')
+                })
+                if not serializer.is_valid():
+                    errors.append({'row': reader.line_num, 'errors': serializer.errors})
+                    continue
+
+                number = serializer.validated_data['courtCaseNumber']
+                if number in taken_numbers:
+                    errors.append({'row': reader.line_num, 'errors': {'courtCaseNumber': ['A case with this court case number already exists.']}})
+                    continue
+
+                if remaining is not None:
+                    # Rows rejected when their chunk is saved don't count, so save the
+                    # pending ones before deciding whether this row still fits
+                    if chunk and len(chunk) >= remaining:
+                        saved = self.save_chunk(chunk, errors)
+                        created += saved
+                        remaining -= saved
+                        chunk = []
+                    if remaining == 0:
+                        errors.append({'row': reader.line_num, 'errors': {'non_field_errors': ['Free plan users can only have up to 3 active cases.']}})
+                        continue
+
+                taken_numbers.add(number)
+                chunk.append((reader.line_num, *build_case(user, serializer.validated_data)))
+                if len(chunk) >= chunk_size:
+                    saved = self.save_chunk(chunk, errors)
+                    created += saved
+                    if remaining is not None:
+                        remaining -= saved
+                    chunk = []
+        except (UnicodeDecodeError, csv.Error):
+            return Response({
+                'status_code': 400,
+                'message': 'Could not read the CSV file.',
+                'data': {'created': created, 'errors': errors}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if chunk:
+            created += self.save_chunk(chunk, errors)
+
+        return Response({
+            'status_code': 200,
+            'message': f'{created} cases imported, {len(errors)} rows rejected.',
+            'data': {
+                'created': created,
+                'errors': errors
+            }
+        }, status=status.HTTP_200_OK)
+
+    def save_chunk(self, chunk, errors):
+        """Inserts the ``(line, case, initial_tx)`` rows of ``chunk`` and returns how many were saved."""
+        # Numbers may also belong to another user's case, check the whole chunk at once
+        foreign = set(CaseDetails.objects.filter(
+            court_case_number__in=[case.court_case_number for _, case, _ in chunk]
+        ).values_list('court_case_number', flat=True))
+
+        rows = []
+        for line, case, initial_tx in chunk:
+            if case.court_case_number in foreign:
+                errors.append({'row': line, 'errors': {'courtCaseNumber': ['This court case number is already in use.']}})
+            else:
+                rows.append((line, case, initial_tx))
+
+        try:
+            with transaction.atomic():
+                CaseDetails.objects.bulk_create([case for _, case, _ in rows])
+                initial_txs = []
+                for _, case, initial_tx in rows:
+                    if initial_tx:
+                        initial_tx.case = case
+                        initial_txs.append(initial_tx)
+                Transaction.objects.bulk_create(initial_txs)
+
+                if rows:
+                    shares = [portfolio_share(case) for _, case, _ in rows]
+                    update_portfolio(rows[0][1].user_id, NO_SHARE, tuple(map(sum, zip(*shares))))
+        except IntegrityError:
+            # A concurrent request took one of the numbers, reject the chunk
+            errors.extend(
+                {'row': line, 'errors': {'non_field_errors': ['Case could not be saved, retry the import.']}}
+                for line, _, _ in rows
+            )
+            return 0
+
+        return len(rows)
+
+
+JUDGMENT_AMOUNT_PLACES = Decimal(1).scaleb(-CaseDetails._meta.get_field('judgment_amount').decimal_places)
+
+
 class EditCaseView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -130,14 +288,25 @@ class EditCaseView(APIView):
                     "message": f"'{field}' is required."
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+        # Parsed the way the column stores it, so the portfolio delta matches the saved amount
+        try:
+            judgment_amount = Decimal(str(data['judgmentAmount'])).quantize(JUDGMENT_AMOUNT_PLACES)
+        except InvalidOperation:
+            return Response({
+                "status_code": 400,
+                "message": "'judgmentAmount' must be a number."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         try:
             with transaction.atomic():
+                share_before = portfolio_share(case)
                 case.case_name = data['caseName']
                 case.court_name = data['courtName']
                 case.court_case_number = data['courtCaseNumber']
-                case.judgment_amount = data['judgmentAmount']
+                case.judgment_amount = judgment_amount
                 case.judgment_date = data['judgmentDate']
                 case.save()
+                update_portfolio(case.user_id, share_before, portfolio_share(case))
 
                 return Response({
                     "status_code": 200,
@@ -158,29 +327,69 @@ class EditCaseView(APIView):
                 "message": f"Failed to update case: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def selected_fields(request):
+    """Field names from a comma separated ``?fields=`` parameter, or None for all fields."""
+    fields = [name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()]
+    return fields or None
+
+
 class CaseListView(ListAPIView):
     serializer_class   = CaseListSerializer
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
         # Return only active cases for the authenticated user
         return CaseDetails.objects.filter(
             user=self.request.user,
             is_active=True
-        ).order_by('-created_at')
+        ).order_by('-created_at', '-id')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = selected_fields(self.request)
+        return context
 
     def list(self, request, *args, **kwargs):
         """
         Override the default list() to wrap the serialized data
         in your custom envelope.
+
+        ``?limit=`` and ``?cursor=`` return one page at a time, ``?fields=``
+        restricts the fields (and columns loaded) to a comma separated list.
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        fields = selected_fields(request)
+        try:
+            params = page_params(request)
+            queryset = self.get_queryset()
+            if fields:
+                queryset = queryset.only(*CaseListSerializer.columns(fields))
+            else:
+                # The full listing is built from plain tuples, see case_list_data()
+                queryset = queryset.values_list(*CASE_LIST_COLUMNS, named=True)
+
+            next_cursor = None
+            if params:
+                queryset, next_cursor = keyset_page(queryset, ('-created_at', '-id'), *params)
+        except ValueError as e:
+            return Response({
+                'status_code': 400,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({
+        if fields:
+            data = self.get_serializer(queryset, many=True).data
+        else:
+            data = case_list_data(queryset, timezone.now().date())
+
+        response_data = {
             'status_code': 200,
             'message': 'List of Cases.',
-            'data': serializer.data
-        }, status=status.HTTP_200_OK)
+            'data': data
+        }
+        if params:
+            response_data['next_cursor'] = next_cursor
+
+        return Response(response_data, status=status.HTTP_200_OK)
 
 
 class CaseDetailView(APIView):
@@ -195,6 +404,31 @@ class CaseDetailView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class CasePayoffView(APIView):
+    def get(self, request, case_id):
+        case = get_object_or_404(CaseDetails, id=case_id, user=request.user, is_active=True)
+
+        # Optional: Get user-provided payoff date, defaults to today
+        date_str = request.query_params.get('date')
+        if date_str:
+            try:
+                as_of = datetime.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError:
+                return Response({
+                    'status_code': 400,
+                    'message': 'Invalid date format. Use YYYY-MM-DD.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            as_of = timezone.now().date()
+
+        serializer = PayoffSerializer(payoff_summary(case, as_of))
+
+        return Response({
+            'status_code': 200,
+            'message': 'Payoff calculated successfully.',
+            'data': serializer.data
+        }, status=status.HTTP_200_OK)
+
 # class CreateTransactionView(APIView):
 #     permission_classes = [permissions.IsAuthenticated]
 
@@ -255,8 +489,6 @@ class CaseDetailView(APIView):
 #             'errors': serializer.errors
 #         }, status=status.HTTP_400_BAD_REQUEST)
 
-getcontext().prec = 50
-
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -534,26 +766,6 @@ logger = logging.getLogger(__name__)
 #             'errors': serializer.errors
 #         }, status=status.HTTP_400_BAD_REQUEST)
 
-# Custom function to implement the unique rounding logic from the web app
-def apply_custom_rounding(value):
-    """
-    Applies the custom rounding logic: rounds to 2 decimal places if the
-    3rd and 4th decimal digits are >= 50, otherwise truncates.
-    """
-    # Truncate to 4 decimal places to isolate the 3rd and 4th digits for checking
-    truncated_to_4 = value.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
-    
-    # Scale to check the 3rd and 4th decimal places
-    scaled_value = int(truncated_to_4 * 10000)
-    third_fourth_digits = abs(scaled_value) % 100
-
-    if third_fourth_digits >= 50:
-        # If 3rd and 4th digits are >= 50, round to 2 decimal places
-        return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-    else:
-        # If 3rd and 4th digits are < 50, truncate to 2 decimal places
-        return (value * 100).to_integral_value(rounding='ROUND_DOWN') / 100
-
 class CreateTransactionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -564,109 +776,68 @@ class CreateTransactionView(APIView):
             
             try:
                 with db_transaction.atomic():
-                    case = CaseDetails.objects.get(id=data['case_id'], user=request.user, is_active=True)
+                    # Lock the case: concurrent transactions on it must build on each other's balances
+                    case = CaseDetails.objects.select_for_update().get(id=data['case_id'], user=request.user, is_active=True)
 
                     new_transaction_date = data['date']
                     
                     # Determine the starting point for this calculation based on the last transaction
                     last_transaction = Transaction.objects.filter(case=case, is_active=True).order_by('date').last()
-                    
+
+                    # A back-dated transaction starts from the last one before it and shifts the rest
+                    backdated = last_transaction is not None and last_transaction.date > new_transaction_date
+                    if backdated:
+                        last_transaction = Transaction.objects.filter(
+                            case=case,
+                            is_active=True,
+                            date__lt=new_transaction_date
+                        ).order_by('date', 'id').last()
+
                     if last_transaction:
-                        start_date = last_transaction.date
-                        # Use the balances from the last transaction's record for the next calculation
-                        current_principal_balance = last_transaction.show_principal_balance
-                        current_accrued_interest = last_transaction.accrued_interest
+                        previous_state = LedgerState.from_transaction(last_transaction)
                     else:
                         # This is the very first transaction on the case
-                        start_date = case.judgment_date
-                        current_principal_balance = case.judgment_amount
-                        current_accrued_interest = Decimal('0.00')
+                        previous_state = LedgerState.opening(case.judgment_amount, case.judgment_date)
+
+                    # 1. Accrue interest and apply the transaction to the running balances
+                    new_state = apply_transaction(
+                        previous_state,
+                        case.interest_rate,
+                        data['transaction_type'],
+                        data['amount'],
+                        new_transaction_date
+                    )
 
-                    # 1. Calculate and round newly-accrued interest
-                    if new_transaction_date > start_date:
-                        days_since_last_transaction = (new_transaction_date - start_date).days
-                        
-                        daily_interest_rate = case.interest_rate / Decimal('36500')
-                        interest_to_accrue = current_principal_balance * daily_interest_rate * Decimal(str(days_since_last_transaction))
-                        
-                        # Apply custom rounding immediately after calculation
-                        rounded_interest_to_accrue = apply_custom_rounding(interest_to_accrue)
-                        current_accrued_interest += rounded_interest_to_accrue
-                        
-                    # 2. Process the new transaction based on its type
-                    if data['transaction_type'] == 'PAYMENT':
-                        payment_amount = data['amount']
-                        
-                        # a. Apply payment to interest first
-                        if payment_amount >= current_accrued_interest:
-                            remaining_payment = payment_amount - current_accrued_interest
-                            current_accrued_interest = Decimal('0.00')
-                            
-                            # b. Apply remaining payment to principal after custom rounding
-                            rounded_remaining_payment = apply_custom_rounding(remaining_payment)
-                            
-                            if rounded_remaining_payment > current_principal_balance:
-                                return Response({
-                                    'status_code': 400,
-                                    'message': 'Payment amount exceeds the outstanding principal balance.'
-                                }, status=status.HTTP_400_BAD_REQUEST)
-                            
-                            current_principal_balance -= rounded_remaining_payment
-                        else:
-                            # Payment only covers a portion of the interest
-                            current_accrued_interest -= payment_amount
-                        
-                        case.total_payments += payment_amount
-                        case.last_payment_date = new_transaction_date
-                    
-                    elif data['transaction_type'] == 'COST':
-                        # Additional costs are added to the principal balance
-                        current_principal_balance += data['amount']
-                    
-                    elif data['transaction_type'] == 'INTEREST':
-                        # Manual interest adjustment
-                        current_accrued_interest += data['amount']
-                    
-                    # 3. Apply the custom rounding logic to the principal balance
-                    rounded_principal_balance = apply_custom_rounding(current_principal_balance)
-
-                    # 4. Calculate the final payoff amount for the transaction date
-                    final_payoff_balance = rounded_principal_balance + current_accrued_interest
-
-                    # Check for existing transaction on the same date
-                    if Transaction.objects.filter(case=case, date=new_transaction_date, is_active=True).exists():
-                        return Response({
-                            'status_code': 400,
-                            'message': f'A transaction already exists for this case on {new_transaction_date}. Only one transaction is allowed per day.'
-                        }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                    # 5. Create the new transaction record
+                    # 2. Create the new transaction record
                     tx = Transaction.objects.create(
                         case=case,
                         transaction_type=data['transaction_type'],
                         amount=data['amount'],
-                        accrued_interest=current_accrued_interest,
-                        principal_balance=final_payoff_balance,
+                        accrued_interest=new_state.accrued_interest,
+                        principal_balance=new_state.payoff,
                         date=new_transaction_date,
-                        show_principal_balance=rounded_principal_balance,
+                        show_principal_balance=new_state.principal,
                         description=data.get('description', '')
                     )
 
-                    # 6. Calculate today's payoff amount
-                    today = timezone.now().date()
-                    if today > new_transaction_date:
-                        days_since_last_transaction = (today - new_transaction_date).days
-                        daily_interest_rate = case.interest_rate / Decimal('36500')
-                        interest_after_tx = rounded_principal_balance * daily_interest_rate * Decimal(str(days_since_last_transaction))
-                        today_payoff = final_payoff_balance + interest_after_tx
+                    # 3. Update the case details with the new final balances for future calculations
+                    if backdated:
+                        # Later transactions accrue on the new balances, replay them
+                        replay_ledger(case, new_transaction_date)
                     else:
-                        today_payoff = final_payoff_balance
-                    
-                    # 7. Update the case details with the new final balances for future calculations
-                    case.payoff_amount = final_payoff_balance
-                    case.accrued_interest = current_accrued_interest
-                    case.today_payoff = today_payoff
-                    case.save()
+                        share_before = portfolio_share(case)
+                        if data['transaction_type'] == 'PAYMENT':
+                            case.total_payments += data['amount']
+                            case.last_payment_date = new_transaction_date
+
+                        case.payoff_amount = new_state.payoff
+                        case.accrued_interest = new_state.accrued_interest
+                        case.last_transaction_date = new_transaction_date
+                        case.today_payoff = payoff_as_of(new_state, case.interest_rate, timezone.now().date())
+                        case.ledger_version += 1
+                        case.save()
+                        update_portfolio(case.user_id, share_before, portfolio_share(case))
+                        record_checkpoint(case, new_state)
 
                     return Response({
                         'status_code': 201,
@@ -688,6 +859,17 @@ class CreateTransactionView(APIView):
                     'status_code': 404,
                     'message': 'Case not found or not active.'
                 }, status=status.HTTP_404_NOT_FOUND)
+            except LedgerError as e:
+                return Response({
+                    'status_code': 400,
+                    'message': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            except IntegrityError:
+                # The one-transaction-per-day constraint rejected the insert
+                return Response({
+                    'status_code': 400,
+                    'message': f'A transaction already exists for this case on {data["date"]}. Only one transaction is allowed per day.'
+                }, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 logger.error("An error occurred during transaction creation.", exc_info=True)
                 return Response({
@@ -701,31 +883,179 @@ class CreateTransactionView(APIView):
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+class BulkCreateTransactionsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, case_id):
+        case = get_object_or_404(CaseDetails, id=case_id, user=request.user, is_active=True)
+
+        # 1. Read the rows from an uploaded CSV file or a JSON list
+        upload = request.FILES.get('file')
+        if upload:
+            try:
+                rows = [
+                    {key: value for key, value in row.items() if key is not None and value not in (None, '')}
+                    for row in csv.DictReader(TextIOWrapper(upload, encoding='utf-8-sig'))
+                ]
+            except (UnicodeDecodeError, csv.Error):
+                return Response({
+                    'status_code': 400,
+                    'message': 'Could not read the CSV file.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            rows = request.data.get('transactions')
+
+        if not isinstance(rows, list) or not rows:
+            return Response({
+                'status_code': 400,
+                'message': 'Provide a non-empty list of transactions or a CSV file.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows) > settings.BULK_TRANSACTIONS_MAX_ROWS:
+            return Response({
+                'status_code': 400,
+                'message': f'At most {settings.BULK_TRANSACTIONS_MAX_ROWS} transactions can be imported at once.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = BulkTransactionSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            return Response({
+                'status_code': 400,
+                'message': 'Invalid input',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 2. Only one transaction is allowed per day, within the batch and on the case
+        dates = [entry['date'] for entry in serializer.validated_data]
+        taken = {day for day, count in Counter(dates).items() if count > 1}
+        taken.update(Transaction.objects.filter(case=case, is_active=True, date__in=dates).values_list('date', flat=True))
+        if taken:
+            return Response({
+                'status_code': 400,
+                'message': 'Only one transaction is allowed per day.',
+                'errors': {'dates': sorted(taken)}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        new_transactions = [
+            Transaction(
+                case=case,
+                transaction_type=entry['transaction_type'],
+                amount=entry['amount'],
+                date=entry['date'],
+                description=entry.get('description', '')
+            )
+            for entry in serializer.validated_data
+        ]
+
+        # 3. Compute every balance in one pass over the ledger and insert the new rows together
+        try:
+            with db_transaction.atomic():
+                # Lock the case and replay on its latest balances
+                case = CaseDetails.objects.select_for_update().get(id=case.id)
+                for tx in new_transactions:
+                    tx.case = case
+                replay_ledger(case, min(dates), new_transactions)
+        except LedgerError as e:
+            return Response({
+                'status_code': 400,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # Another request added a transaction on one of these dates meanwhile
+            return Response({
+                'status_code': 400,
+                'message': 'Only one transaction is allowed per day.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'status_code': 201,
+            'message': f'{len(new_transactions)} transactions added successfully.',
+            'data': {
+                'case_id': case.id,
+                'transaction_ids': [tx.id for tx in sorted(new_transactions, key=lambda tx: tx.date)],
+                'payoff_amount': str(case.payoff_amount),
+                'accrued_interest': str(case.accrued_interest),
+                'total_payments': str(case.total_payments)
+            }
+        }, status=status.HTTP_201_CREATED)
+
 class TransactionListByCaseView(ListAPIView):
     serializer_class = TransactionDetailSerializer
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def get_case(self):
+        # Ensure user owns this case, fetched once per request
+        if not hasattr(self, '_case'):
+            self._case = CaseDetails.objects.filter(
+                id=self.kwargs.get('case_id'),
+                user=self.request.user,
+                is_active=True
+            ).first()
+        return self._case
 
     def get_queryset(self):
-        case_id = self.kwargs.get('case_id')
-
-        # Ensure user owns this case
-        case = CaseDetails.objects.filter(id=case_id, user=self.request.user, is_active=True).first()
+        case = self.get_case()
         if not case:
             return Transaction.objects.none()
 
-        return Transaction.objects.filter(
-            case__id=case_id,
-            case__user=self.request.user,
-            is_active=True
-        ).order_by('-date')
+        # Newest first, from the cached timeline
+        return ledger_timeline(case)[::-1]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        case = self.get_case()
+        if case:
+            # Every row shares the case's rate, don't look it up per transaction
+            context['interest_rate'] = case.interest_rate
+        context['fields'] = selected_fields(self.request)
+        return context
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
+        fields = selected_fields(request)
+        try:
+            if fields:
+                columns = TransactionDetailSerializer.columns(fields)
+
+            params = page_params(request)
+            next_cursor = None
+            case = self.get_case()
+            if params and case:
+                # Pages are read straight from the database instead of the cached timeline
+                queryset = Transaction.objects.filter(case=case, is_active=True)
+                if fields:
+                    queryset = queryset.only(*columns)
+                else:
+                    queryset = queryset.values_list(*TRANSACTION_LIST_COLUMNS, named=True)
+                queryset, next_cursor = keyset_page(queryset, ('-date', '-id'), *params)
+            else:
+                queryset = self.get_queryset()
+        except ValueError as e:
+            return Response({
+                "status_code": 400,
+                "message": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if fields:
+            transactions = self.get_serializer(queryset, many=True).data
+        elif case:
+            if not params:
+                # The cached timeline holds model instances
+                queryset = map(attrgetter(*TRANSACTION_LIST_COLUMNS), queryset)
+            transactions = transaction_list_data(queryset, case.interest_rate)
+        else:
+            transactions = []
+
+        response_data = {
             "status_code": 200,
             "message": "Transactions retrieved successfully.",
-            "transactions": serializer.data  # could be empty list []
-        }, status=status.HTTP_200_OK)
+            "transactions": transactions  # could be empty list []
+        }
+        if params:
+            response_data["next_cursor"] = next_cursor
+
+        return Response(response_data, status=status.HTTP_200_OK)
 
 # class UpdateTransactionView(APIView):
 #     permission_classes = [permissions.IsAuthenticated]
@@ -776,8 +1106,6 @@ class TransactionListByCaseView(ListAPIView):
 #             'errors': serializer.errors
 #         }, status=status.HTTP_400_BAD_REQUEST)
 
-getcontext().prec = 50
-
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -797,114 +1125,60 @@ class UpdateTransactionView(APIView):
         if serializer.is_valid():
             data = serializer.validated_data
 
-            updated_date = data.get('date', tx.date)  # Use updated date if provided, else keep existing
-            if Transaction.objects.filter(case=tx.case, date=updated_date, is_active=True).exclude(id=tx.id).exists():
+            try:
+                with db_transaction.atomic():
+                    # Lock the case and re-read the transaction, another request may have just changed it
+                    case = CaseDetails.objects.select_for_update().get(id=tx.case_id)
+                    tx.refresh_from_db()
+                    if not tx.is_active:
+                        raise Transaction.DoesNotExist
+                    tx.case = case
+                    original_date = tx.date
+
+                    # Update the transaction object with new data
+                    for field, value in data.items():
+                        setattr(tx, field, value)
+                    tx.save()
+
+                    # Recalculate balances from the earliest date the edit affects onwards
+                    replayed = replay_ledger(case, min(original_date, tx.date))
+                    updated_tx = next((current_tx for current_tx in replayed if current_tx.id == tx.id), tx)
+
+            except Transaction.DoesNotExist:
+                # Deleted, possibly by a concurrent request while this one waited for the lock
+                return Response({
+                    'status_code': 404,
+                    'message': 'Transaction not found or access denied.'
+                }, status=status.HTTP_404_NOT_FOUND)
+            except LedgerError as e:
                 return Response({
                     'status_code': 400,
-                    'message': f'Another transaction already exists for this case on {updated_date}. Only one transaction is allowed per day.'
+                    'message': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            except IntegrityError:
+                # The one-transaction-per-day constraint rejected the new date
+                return Response({
+                    'status_code': 400,
+                    'message': f'Another transaction already exists for this case on {tx.date}. Only one transaction is allowed per day.'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            with db_transaction.atomic():
-                case = tx.case
-                
-                # Update the transaction object with new data
-                for field, value in data.items():
-                    setattr(tx, field, value)
-                tx.save()
-
-                # Recalculate balances from the edited transaction onwards
-                
-                # Get all transactions from the edited one's date onwards, sorted by date
-                recalc_transactions = Transaction.objects.filter(case=case, is_active=True, date__gte=tx.date).order_by('date', 'id')
-                
-                # Determine the starting point for the recalculation
-                last_transaction_before_edit = Transaction.objects.filter(
-                    case=case, 
-                    is_active=True, 
-                    date__lt=tx.date
-                ).order_by('date', 'id').last()
-
-                if not last_transaction_before_edit:
-                    # This is the first transaction on the case, so use judgment details
-                    starting_principal_balance = case.judgment_amount
-                    starting_accrued_interest = Decimal('0.00')
-                    start_date = case.judgment_date
-                else:
-                    starting_principal_balance = last_transaction_before_edit.principal_balance - last_transaction_before_edit.accrued_interest
-                    starting_accrued_interest = last_transaction_before_edit.accrued_interest
-                    start_date = last_transaction_before_edit.date
-                
-                # Reset total payments to re-sum them
-                case.total_payments = Decimal('0.00')
-
-                # Iterate through all transactions that need to be recalculated
-                for current_tx in recalc_transactions:
-                    
-                    # 1. Calculate accrued interest since the last transaction
-                    current_accrued_interest = starting_accrued_interest
-                    
-                    if current_tx.date > start_date:
-                        days_since_last_transaction = (current_tx.date - start_date).days
-                        daily_interest_rate = case.interest_rate / Decimal('36500')
-                        interest_to_accrue = starting_principal_balance * daily_interest_rate * Decimal(str(days_since_last_transaction))
-                        current_accrued_interest += interest_to_accrue
-                        
-                    # 2. Process the current transaction's type
-                    if current_tx.transaction_type == 'PAYMENT':
-                        payment_amount = current_tx.amount
-                        if payment_amount >= current_accrued_interest:
-                            remaining_payment = payment_amount - current_accrued_interest
-                            current_accrued_interest = Decimal('0.00')
-                            starting_principal_balance -= remaining_payment
-                        else:
-                            current_accrued_interest -= payment_amount
-                        case.total_payments += payment_amount
-                        case.last_payment_date = current_tx.date
-                    
-                    elif current_tx.transaction_type == 'COST':
-                        starting_principal_balance += current_tx.amount
-                    
-                    elif current_tx.transaction_type == 'INTEREST':
-                        current_accrued_interest += current_tx.amount
-
-                    # 3. Calculate final balances and update the transaction record
-                    current_tx.accrued_interest = current_accrued_interest
-                    current_tx.principal_balance = starting_principal_balance + current_accrued_interest
-                    current_tx.show_principal_balance = starting_principal_balance
-                    current_tx.save(update_fields=['accrued_interest', 'principal_balance', 'show_principal_balance'])
-
-                    # 4. Prepare for the next iteration
-                    starting_principal_balance = starting_principal_balance
-                    starting_accrued_interest = current_accrued_interest
-                    start_date = current_tx.date
-
-                # 5. Update the CaseDetails model with the final balances
-                final_transaction = recalc_transactions.last()
-                if final_transaction:
-                    case.payoff_amount = final_transaction.principal_balance
-                    case.accrued_interest = final_transaction.accrued_interest
-                    case.today_payoff = starting_principal_balance + current_accrued_interest
-                
-                case.save(update_fields=['payoff_amount', 'accrued_interest', 'total_payments', 'last_payment_date', 'today_payoff'])
-
-                # Serialize and return the updated transaction object
-                updated_tx = Transaction.objects.get(id=tx.id)
-                response_data = {
-                    'transaction_id': updated_tx.id,
-                    'case_id': updated_tx.case.id,
-                    'transaction_type': updated_tx.transaction_type,
-                    'amount': str(updated_tx.amount),
-                    'accrued_interest': str(updated_tx.accrued_interest),
-                    'principal_balance': str(updated_tx.principal_balance),
-                    'date': updated_tx.date,
-                    'description': updated_tx.description
-                }
+            # Serialize and return the updated transaction object
+            response_data = {
+                'transaction_id': updated_tx.id,
+                'case_id': updated_tx.case_id,
+                'transaction_type': updated_tx.transaction_type,
+                'amount': str(updated_tx.amount),
+                'accrued_interest': str(updated_tx.accrued_interest),
+                'principal_balance': str(updated_tx.principal_balance),
+                'date': updated_tx.date,
+                'description': updated_tx.description
+            }
 
-                return Response({
-                    'status_code': 200,
-                    'message': 'Transaction and subsequent balances updated successfully.',
-                    'data': response_data
-                }, status=status.HTTP_200_OK)
+            return Response({
+                'status_code': 200,
+                'message': 'Transaction and subsequent balances updated successfully.',
+                'data': response_data
+            }, status=status.HTTP_200_OK)
 
         return Response({
             'status_code': 400,
@@ -1038,6 +1312,92 @@ class UpdateTransactionView(APIView):
 #         response['Content-Disposition'] = f'attachment; filename=payoff_statement_case_{case_id}.pdf'
 #         return response
 
+def parse_date_param(request, name):
+    """Date from the ``name`` query parameter, None when absent; raises ValueError on a bad format."""
+    date_str = request.query_params.get(name)
+    if not date_str:
+        return None
+    return datetime.strptime(date_str, "%Y-%m-%d").date()
+
+
+def pdf_response(pdf, filename):
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def cached_pdf_response(request, case, kind, end_date, renderer):
+    """
+    The document from the PDF cache, rendering it on a miss. The cache key
+    doubles as the ETag, so a client that already holds the document gets a
+    304 without anything being read or rendered.
+    """
+    today = document_date(kind)
+    key = document_key(kind, case, request.user, end_date, today, renderer)
+    etag = quote_etag(key)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        pdf = render_cached(kind, case, request.user, end_date, today, renderer, key=key)
+        response = pdf_response(pdf, document_filename(kind, case.id))
+
+    response['ETag'] = etag
+    # Statements are per user and must be revalidated before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def streamed_transactions_response(request, case, end_date):
+    """
+    The transaction summary written page by page as the ledger is read, for
+    ledgers too long to render in one piece. Nothing is cached, but the ETag
+    still spares a client that holds the document the download.
+    """
+    today = document_date(CASE_TRANSACTIONS)
+    etag = quote_etag(document_key(CASE_TRANSACTIONS, case, request.user, end_date, today, 'stream'))
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        rows = ledger_rows(case, end_date).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(stream_case_transactions(case, rows, today), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename={document_filename(CASE_TRANSACTIONS, case.id)}'
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def render_or_enqueue(request, case, kind, end_date, renderer):
+    """
+    Serves cached documents and renders small ledgers right away; larger
+    ones are queued for the PDF worker, answering 202 with the job to poll.
+    """
+    today = document_date(kind)
+    key = document_key(kind, case, request.user, end_date, today, renderer)
+    pdf = get_cached_pdf(key)
+    if pdf is not None:
+        return pdf_response(pdf, document_filename(kind, case.id))
+
+    # Counted in the database: loading the ledger here would defeat queuing it
+    if ledger_rows(case, end_date).count() <= settings.PDF_SYNC_MAX_ROWS:
+        try:
+            pdf = render_document(kind, case, request.user, end_date, today, renderer)
+        except PDFRenderError as e:
+            return Response({
+                'status_code': 500,
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        store_pdf(key, pdf)
+        return pdf_response(pdf, document_filename(kind, case.id))
+
+    job = enqueue_pdf_job(request.user, case, kind, end_date, renderer)
+    return Response({
+        'status_code': 202,
+        'message': 'The document is being generated.',
+        'data': PDFJobSerializer(job).data
+    }, status=status.HTTP_202_ACCEPTED)
+
+
 class GeneratePayoffPDFView(APIView):
     def get(self, request, case_id):
         try:
@@ -1046,85 +1406,83 @@ class GeneratePayoffPDFView(APIView):
             return HttpResponse("Case not found.", status=404)
 
         # Optional: Get user-provided end date
-        date_str = request.GET.get('date')
-        if date_str:
-            try:
-                end_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            except ValueError:
-                return HttpResponse("Invalid date format. Use YYYY-MM-DD.", status=400)
-        else:
-            end_date = now().date()
+        try:
+            end_date = parse_date_param(request, 'date') or now().date()
+        except ValueError:
+            return HttpResponse("Invalid date format. Use YYYY-MM-DD.", status=400)
 
-        # Get only active transactions till the given date
-        transactions = case.transactions.filter(is_active=True, date__lte=end_date).order_by('date')
+        try:
+            renderer = pdf_renderer(request.query_params.get('renderer'))
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
 
-        # Get latest transaction before or on the end_date for payoff
-        last_tx = transactions.last()
-        payoff_amount = last_tx.principal_balance if last_tx else case.judgment_amount
+        try:
+            return cached_pdf_response(request, case, PAYOFF_STATEMENT, end_date, renderer)
+        except PDFRenderError:
+            return HttpResponse('Failed to generate PDF', status=500)
 
-        # Calculate daily interest (optional visual value)
-        daily_interest = case.judgment_amount * (case.interest_rate / 100) / Decimal('365')
+    def post(self, request, case_id):
+        case = get_object_or_404(CaseDetails, id=case_id, user=request.user)
+        try:
+            end_date = parse_date_param(request, 'date') or now().date()
+        except ValueError:
+            return Response({
+                'status_code': 400,
+                'message': 'Invalid date format. Use YYYY-MM-DD.'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Calculate total interest accrued till that date
-        days_since_judgment = (end_date - case.judgment_date).days
-        accrued_interest = round(daily_interest * days_since_judgment, 2)
+        try:
+            renderer = pdf_renderer(request.query_params.get('renderer'))
+        except ValueError as e:
+            return Response({
+                'status_code': 400,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Lawyer details from authenticated user
-        user = request.user
-        lawyer_info = {
-            'name': user.full_name or f"{user.first_name} {user.last_name}",
-            'firm': user.company or "Law Firm",
-            'address': user.location or "N/A",
-            'city_state_zip': f"{user.state or ''}, {user.country or ''} {user.postal_code or ''}".strip(', '),
-            'phone': user.phone_number or "N/A",
-            'email': user.email,
-            'image': user.image,
-            'date': now().strftime('%B %d, %Y')
-        }
+        return render_or_enqueue(request, case, PAYOFF_STATEMENT, end_date, renderer)
 
-        # Render HTML to string
-        html_string = render_to_string('docket/payoff_statement.html', {
-            'case': case,
-            'debtor_info': case.debtor_info,
-            'transactions': transactions,
-            'daily_interest': f"{daily_interest:.2f}",
-            'interest_start_date': end_date,
-            'today': end_date,
-            'payoff_amount': f"{payoff_amount:.2f}",
-            'accrued_interest': f"{accrued_interest:.2f}",
-            'lawyer': lawyer_info,
-        })
-
-        # Generate PDF
-        pdf_file = BytesIO()
-        pisa_status = pisa.CreatePDF(src=html_string, dest=pdf_file)
-
-        if pisa_status.err:
-            return HttpResponse('Failed to generate PDF', status=500)
 
-        pdf_file.seek(0)
-        response = HttpResponse(pdf_file, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=payoff_statement_case_{case_id}.pdf'
-        return response
+class PortfolioSummaryView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            summary = request.user.portfolio_summary
+        except UserPortfolioSummary.DoesNotExist:
+            # Users who haven't changed a case since summaries were introduced
+            summary = rebuild_portfolio(request.user.id)
+
+        serializer = PortfolioSummarySerializer(summary)
+        return Response({
+            'status_code': 200,
+            'message': 'Portfolio summary retrieved successfully.',
+            'data': serializer.data
+        }, status=status.HTTP_200_OK)
 
 
 class DeleteCaseView(APIView):
     def delete(self, request, case_id):
         case = get_object_or_404(CaseDetails, id=case_id, user=request.user, is_active=True)
 
-        # Soft delete the case
-        case.is_active = False
-        case.deleted_at = timezone.now()
-        case.deleted_by = request.user.email
-        case.save()
-
-        # Delete all related transactions
-        # Transaction.objects.filter(case=case).delete()
-        Transaction.objects.filter(case=case).update(
-            is_active=False,
-            deleted_at=timezone.now(),
-            deleted_by=request.user.email
-        )
+        with transaction.atomic():
+            share_before = portfolio_share(case)
+
+            # Soft delete the case
+            case.is_active = False
+            case.deleted_at = timezone.now()
+            case.deleted_by = request.user.email
+            case.ledger_version += 1
+            case.save()
+
+            # Delete all related transactions
+            # Transaction.objects.filter(case=case).delete()
+            Transaction.objects.filter(case=case).update(
+                is_active=False,
+                deleted_at=timezone.now(),
+                deleted_by=request.user.email
+            )
+
+            update_portfolio(case.user_id, share_before, NO_SHARE)
 
         return Response({
             "success": True,
@@ -1165,59 +1523,305 @@ class DownloadCaseTransactionsPDF(APIView):
         try:
             # Get the case for the authenticated user
             case = CaseDetails.objects.get(id=case_id, user=request.user)
+        except CaseDetails.DoesNotExist:
+            return HttpResponse("Case not found", status=404)
 
-            # Get optional end date from query params (e.g., ?end_date=2025-07-21)
-            end_date_str = request.query_params.get('end_date')
-            try:
-                if end_date_str:
-                    end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-                    transactions = case.transactions.filter(is_active=True, date__lte=end_date).order_by('date')
-                else:
-                    transactions = case.transactions.filter(is_active=True).order_by('date')
-            except ValueError:
-                return HttpResponse("Invalid date format. Use YYYY-MM-DD.", status=400)
-
-            # Prepare the template and context
-            template_path = 'docket/case_transactions.html'
-            context = {
-                'case': case,
-                'transactions': transactions,
-                'today': datetime.now().date()
-            }
+        # Get optional end date from query params (e.g., ?end_date=2025-07-21)
+        try:
+            end_date = parse_date_param(request, 'end_date')
+        except ValueError:
+            return HttpResponse("Invalid date format. Use YYYY-MM-DD.", status=400)
 
-            # Render HTML and generate PDF
-            template = get_template(template_path)
-            html = template.render(context)
+        try:
+            renderer = pdf_renderer(request.query_params.get('renderer'))
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
 
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename=case_{case_id}_transactions.pdf'
+        # Long ledgers (or ?stream=true) are streamed instead of rendered whole
+        if request.query_params.get('stream') in ('1', 'true') or (
+            ledger_rows(case, end_date).count() > settings.PDF_STREAM_MIN_ROWS
+        ):
+            return streamed_transactions_response(request, case, end_date)
 
-            pisa_status = pisa.CreatePDF(html, dest=response)
-            if pisa_status.err:
-                return HttpResponse('We had some errors generating the PDF', status=500)
+        try:
+            return cached_pdf_response(request, case, CASE_TRANSACTIONS, end_date, renderer)
+        except PDFRenderError:
+            return HttpResponse('We had some errors generating the PDF', status=500)
+
+    def post(self, request, case_id):
+        case = get_object_or_404(CaseDetails, id=case_id, user=request.user)
+        try:
+            end_date = parse_date_param(request, 'end_date')
+        except ValueError:
+            return Response({
+                'status_code': 400,
+                'message': 'Invalid date format. Use YYYY-MM-DD.'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-            return response
+        try:
+            renderer = pdf_renderer(request.query_params.get('renderer'))
+        except ValueError as e:
+            return Response({
+                'status_code': 400,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        except CaseDetails.DoesNotExist:
-            return HttpResponse("Case not found", status=404)
+        return render_or_enqueue(request, case, CASE_TRANSACTIONS, end_date, renderer)
+
+
+class PDFJobDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(PDFJob.objects.defer('pdf'), id=job_id, user=request.user)
+        return Response({
+            'status_code': 200,
+            'message': 'PDF job retrieved successfully.',
+            'data': PDFJobSerializer(job).data
+        }, status=status.HTTP_200_OK)
+
+
+class PDFJobDownloadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(PDFJob, id=job_id, user=request.user)
+        if job.status != PDFJob.DONE:
+            return Response({
+                'status_code': 409,
+                'message': f'The document is not ready (status: {job.status}).'
+            }, status=status.HTTP_409_CONFLICT)
+
+        return pdf_response(bytes(job.pdf), document_filename(job.kind, job.case_id))
+
+
+class StatementBatchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = StatementBatchCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status_code': 400,
+                'message': 'Invalid input',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        # 1. Resolve the cases, keeping the requested order
+        cases = CaseDetails.objects.filter(user=request.user, is_active=True)
+        if data['all_active']:
+            case_ids = list(cases.order_by('case_name', 'id').values_list('id', flat=True))
+        else:
+            requested = list(dict.fromkeys(data['case_ids']))
+            found = set(cases.filter(id__in=requested).values_list('id', flat=True))
+            missing = [case_id for case_id in requested if case_id not in found]
+            if missing:
+                return Response({
+                    'status_code': 404,
+                    'message': 'Some cases were not found.',
+                    'errors': {'case_ids': missing}
+                }, status=status.HTTP_404_NOT_FOUND)
+            case_ids = requested
+
+        if not case_ids:
+            return Response({
+                'status_code': 400,
+                'message': 'There are no active cases to send statements for.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(case_ids) > settings.STATEMENT_BATCH_MAX_CASES:
+            return Response({
+                'status_code': 400,
+                'message': f'At most {settings.STATEMENT_BATCH_MAX_CASES} statements can be generated at once.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 2. Queue one job per case for the PDF workers
+        batch = enqueue_statement_batch(
+            request.user, case_ids, data.get('date') or now().date(), data['format'], pdf_renderer(data.get('renderer'))
+        )
+        batch = with_progress(StatementBatch.objects.filter(id=batch.id)).get()
+        return Response({
+            'status_code': 202,
+            'message': 'The statements are being generated.',
+            'data': StatementBatchSerializer(batch).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class StatementBatchDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, batch_id):
+        batch = get_object_or_404(with_progress(StatementBatch.objects.all()), id=batch_id, user=request.user)
+        return Response({
+            'status_code': 200,
+            'message': 'Statement batch retrieved successfully.',
+            'data': StatementBatchSerializer(batch).data
+        }, status=status.HTTP_200_OK)
+
+
+class StatementBatchDownloadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, batch_id):
+        batch = get_object_or_404(with_progress(StatementBatch.objects.all()), id=batch_id, user=request.user)
+        if batch.done + batch.failed < batch.total:
+            return Response({
+                'status_code': 409,
+                'message': f'{batch.done + batch.failed} of {batch.total} statements are ready.'
+            }, status=status.HTTP_409_CONFLICT)
+
+        # Statements that failed to render are left out; the batch reports how many
+        jobs = (
+            batch.jobs.filter(status=PDFJob.DONE)
+            .order_by('id')
+            .only('case_id', 'kind', 'pdf')
+            .iterator(chunk_size=50)
+        )
+        filename = f'payoff_statements_{batch.end_date}'
+        if batch.format == StatementBatch.MERGED_PDF:
+            return pdf_response(merge_pdfs(bytes(job.pdf) for job in jobs), f'{filename}.pdf')
+
+        files = ((document_filename(job.kind, job.case_id), bytes(job.pdf)) for job in jobs)
+        response = StreamingHttpResponse(zip_stream(files), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename={filename}.zip'
+        return response
 
 
 class DeleteTransactionView(APIView):
     def delete(self, request, transaction_id):
-        transaction = get_object_or_404(Transaction, id=transaction_id)
+        transaction = get_object_or_404(Transaction.objects.select_related('case'), id=transaction_id, is_active=True)
 
         # Ensure only the owner of the related case can delete
-        if transaction.case.user != request.user:
+        if transaction.case.user_id != request.user.id:
             return Response({
                 "status_code": 403,
                 "message": "You are not authorized to delete this transaction."
             }, status=status.HTTP_403_FORBIDDEN)
 
-        # Soft delete the transaction
-        transaction.is_active = False
-        transaction.save()
+        try:
+            with db_transaction.atomic():
+                # Lock the case and re-read the transaction, another request may have just changed it
+                case = CaseDetails.objects.select_for_update().get(id=transaction.case_id)
+                transaction.refresh_from_db()
+                if not transaction.is_active:
+                    raise Transaction.DoesNotExist
+
+                # Soft delete the transaction
+                transaction.is_active = False
+                transaction.deleted_at = timezone.now()
+                transaction.deleted_by = request.user.email
+                transaction.save(update_fields=['is_active', 'deleted_at', 'deleted_by', 'updated_at'])
+
+                # Later transactions no longer accrue on the deleted one's balances
+                replay_ledger(case, transaction.date)
+        except Transaction.DoesNotExist:
+            # Deleted by a concurrent request while this one waited for the lock
+            return Response({
+                "status_code": 404,
+                "message": "Transaction not found."
+            }, status=status.HTTP_404_NOT_FOUND)
+        except LedgerError as e:
+            return Response({
+                "status_code": 400,
+                "message": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "status_code": 200,
-            "message": "Transaction deleted successfully (soft delete)."
+            "message": "Transaction deleted successfully (soft delete).",
+            "data": {
+                "transaction_id": transaction.id,
+                "case_id": case.id,
+                "payoff_amount": str(case.payoff_amount),
+                "accrued_interest": str(case.accrued_interest),
+                "total_payments": str(case.total_payments),
+                "today_payoff": str(case.today_payoff)
+            }
         }, status=status.HTTP_200_OK)
+
+
+class TimelineCacheStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response({
+            'status_code': 200,
+            'message': 'Timeline cache statistics retrieved successfully.',
+            'data': timeline_cache_stats()
+        }, status=status.HTTP_200_OK)
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+EXPORT_COLUMNS = [
+    ('case_id', 'case_id'),
+    ('court_case_number', 'case__court_case_number'),
+    ('case_name', 'case__case_name'),
+    ('date', 'date'),
+    ('transaction_type', 'transaction_type'),
+    ('amount', 'amount'),
+    ('description', 'description'),
+    ('accrued_interest', 'accrued_interest'),
+    ('principal_balance', 'show_principal_balance'),
+    ('payoff_balance', 'principal_balance'),
+]
+
+
+def export_csv_lines(rows, lines_per_chunk=500):
+    """CSV text for EXPORT_COLUMNS ``rows``, yielded a few hundred lines at a time."""
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in EXPORT_COLUMNS])
+
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow([f'{value:f}' if isinstance(value, Decimal) else value for value in row]))
+        if len(lines) >= lines_per_chunk:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+class ExportTransactionsCSVView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        transactions = Transaction.objects.filter(case__user=request.user, case__is_active=True, is_active=True)
+
+        # Optional comma separated case ids (e.g. ?cases=4,7,9), all active cases by default
+        cases_str = request.query_params.get('cases')
+        if cases_str:
+            try:
+                case_ids = [int(case_id) for case_id in cases_str.split(',') if case_id.strip()]
+            except ValueError:
+                return Response({
+                    'status_code': 400,
+                    'message': 'cases must be a comma separated list of case ids.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            transactions = transactions.filter(case_id__in=case_ids)
+
+        end_date_str = request.query_params.get('end_date')
+        if end_date_str:
+            try:
+                end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+            except ValueError:
+                return Response({
+                    'status_code': 400,
+                    'message': 'Invalid date format. Use YYYY-MM-DD.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            transactions = transactions.filter(date__lte=end_date)
+
+        # Rows are fetched in chunks with a server-side cursor and written out as they arrive
+        rows = transactions.order_by('case_id', 'date', 'id').values_list(
+            *(field for _, field in EXPORT_COLUMNS)
+        ).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+        response = StreamingHttpResponse(export_csv_lines(rows), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename=transactions.csv'
+        return response
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 import dj_database_url
@@ -185,3 +186,60 @@ SIMPLE_JWT = {
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 BASE_URL = os.getenv("BASE_URL")
+
+# Ledger: a balance checkpoint is stored every N transactions of a case
+LEDGER_CHECKPOINT_INTERVAL = 50
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Computed transaction timelines are cached per (case, ledger_version) in this cache
+LEDGER_TIMELINE_CACHE = 'default'
+LEDGER_TIMELINE_TIMEOUT = 60 * 60
+
+# Largest number of transactions accepted by one bulk import request
+BULK_TRANSACTIONS_MAX_ROWS = 5000
+
+# Cases inserted per bulk_create when importing a CSV of cases
+CASE_IMPORT_CHUNK_SIZE = 500
+
+# Rows fetched per round trip when streaming the transactions CSV export
+EXPORT_CHUNK_SIZE = 2000
+
+# PDF requests (POST) for ledgers with more rows than this are queued for `manage.py run_pdf_worker`
+PDF_SYNC_MAX_ROWS = 200
+
+# Transaction summaries (GET) for ledgers with more rows than this are streamed page by page, never held whole in memory
+PDF_STREAM_MIN_ROWS = 5000
+
+# Rendered PDFs are cached in this storage, keyed by a hash of everything printed on them.
+# The default directory is under /tmp, the only writable place on Vercel; set PDF_CACHE_DIR to keep it elsewhere
+PDF_CACHE_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {
+        'location': os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), 'pdf_cache')),
+    },
+}
+# Least recently used PDFs are evicted once the cache grows past this size
+PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Default PDF renderer: 'xhtml2pdf' (the HTML templates) or 'reportlab' (the same layouts drawn directly).
+# Requests can pick one with ?renderer=
+PDF_RENDERER = 'xhtml2pdf'
+
+# Render a sample of each PDF when a process starts, so the first real request doesn't pay for warming up
+PDF_WARMUP = os.getenv("PDF_WARMUP", "False") == "True"
+
+# Local copies of the logos printed on PDFs, so rendering never fetches them (`manage.py cache_logos` fills it)
+LOGO_CACHE_DIR = os.path.join(BASE_DIR, 'logo_cache')
+# Logos are downsampled to fit in a square of this many pixels
+LOGO_MAX_PIXELS = 360
+
+# Largest number of payoff statements one batch request can queue
+STATEMENT_BATCH_MAX_CASES = 5000